@@ -8,6 +8,9 @@ Version: 2.0 (Fixed Schema)
 import sqlite3
 import logging
 import os
+import hashlib
+import hmac
+import atexit
 from datetime import datetime
 
 # Configure logging
@@ -29,6 +32,272 @@ DEFAULT_COLLEGE_LOCATION = {
     'radius_meters': 5500
 }
 
+# Connection tuning applied after WAL is enabled:
+# NORMAL sync is crash-safe under WAL, busy_timeout waits instead of raising SQLITE_BUSY
+SQLITE_TUNING_PRAGMAS = """
+PRAGMA synchronous = NORMAL;
+PRAGMA busy_timeout = 30000;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -20000;
+PRAGMA mmap_size = 268435456;
+"""
+
+# Bounded first-pass ANALYZE so query-planner stats exist without a full scan
+SQLITE_INITIAL_OPTIMIZE = """
+PRAGMA analysis_limit = 400;
+PRAGMA optimize = 0x10002;
+"""
+
+# Seconds between PRAGMA optimize runs for long-lived connections
+OPTIMIZE_INTERVAL_SECONDS = 900
+
+# Larger pages halve overflow chains for the photo BLOBs
+PAGE_SIZE = 8192
+
+# Pages copied per step of the online backup
+BACKUP_PAGES_PER_STEP = 200
+
+# Tables managed by this module, in creation order
+TABLES = ('users', 'location_zones', 'attendance', 'parent_contacts',
+          'attendance_sessions', 'admin_users', 'attendance_logs', 'attendance_images')
+
+# Columns missing from databases created by the original inline schemas
+# (users(id, name) and attendance(id, user_id, date, time, status, ...)).
+# ALTER TABLE ADD COLUMN only accepts constant defaults, so timestamps are
+# added without one and bound explicitly by the inserts.
+LEGACY_COLUMNS = {
+    'users': (
+        ('email', 'TEXT'),
+        ('phone', 'TEXT'),
+        ('roll_number', 'TEXT'),
+        ('department', 'TEXT'),
+        ('year_of_study', 'INTEGER'),
+        ('is_active', 'INTEGER DEFAULT 1'),
+        ('created_at', 'TIMESTAMP'),
+        ('updated_at', 'TIMESTAMP'),
+    ),
+    'location_zones': (
+        ('description', 'TEXT'),
+        ('created_by', 'TEXT'),
+        ('created_at', 'TIMESTAMP'),
+        ('updated_at', 'TIMESTAMP'),
+    ),
+    'attendance': (
+        ('latitude', 'REAL'),
+        ('longitude', 'REAL'),
+        ('distance_meters', 'REAL'),
+        ('zone_id', 'INTEGER REFERENCES location_zones(id) ON DELETE SET NULL'),
+        ('accuracy_meters', 'REAL'),
+        ('device_info', 'TEXT'),
+        ('ip_address', 'TEXT'),
+        ('user_agent', 'TEXT'),
+        ('notes', 'TEXT'),
+        ('verified_by', 'TEXT'),
+        ('is_manual', 'INTEGER DEFAULT 0'),
+        ('created_at', 'TIMESTAMP'),
+        ('updated_at', 'TIMESTAMP'),
+    ),
+    'parent_contacts': (
+        ('email', 'TEXT'),
+        ('is_primary', 'INTEGER DEFAULT 0'),
+        ('is_active', 'INTEGER DEFAULT 1'),
+        ('created_at', 'TIMESTAMP'),
+    ),
+}
+
+# Uniqueness the application's ON CONFLICT clauses rely on; legacy tables
+# declared none (attendance) or only some (users.name) of these
+LEGACY_UNIQUE_INDEXES = (
+    ('idx_users_name_unique', 'users', ('name',)),
+    ('idx_users_email_unique', 'users', ('email',)),
+    ('idx_users_roll_number_unique', 'users', ('roll_number',)),
+    ('idx_attendance_user_date_unique', 'attendance', ('user_id', 'date')),
+)
+
+# Table definitions, run as one script inside the schema transaction
+SCHEMA_SQL = """
+-- 1. Users Table (Enhanced)
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE,
+    phone TEXT,
+    roll_number TEXT UNIQUE,
+    department TEXT,
+    year_of_study INTEGER,
+    is_active INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 2. Location Zones Table
+CREATE TABLE IF NOT EXISTS location_zones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    radius_meters REAL NOT NULL,
+    is_active INTEGER DEFAULT 0,
+    created_by TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    -- Constraints
+    CONSTRAINT check_latitude CHECK (latitude >= -90 AND latitude <= 90),
+    CONSTRAINT check_longitude CHECK (longitude >= -180 AND longitude <= 180),
+    CONSTRAINT check_radius CHECK (radius_meters > 0),
+    CONSTRAINT check_active CHECK (is_active IN (0, 1))
+);
+
+-- 3. Attendance Table (Complete)
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'Present',
+    latitude REAL,
+    longitude REAL,
+    distance_meters REAL,
+    zone_id INTEGER,
+    accuracy_meters REAL,
+    device_info TEXT,
+    ip_address TEXT,
+    user_agent TEXT,
+    notes TEXT,
+    verified_by TEXT,
+    is_manual INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    -- Foreign Keys
+    FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY(zone_id) REFERENCES location_zones(id) ON DELETE SET NULL,
+
+    -- Constraints
+    CONSTRAINT check_status CHECK (status IN ('Present', 'Absent', 'Late', 'Excused')),
+    CONSTRAINT check_distance CHECK (distance_meters >= 0),
+    CONSTRAINT check_manual CHECK (is_manual IN (0, 1)),
+
+    -- Unique constraint to prevent duplicate attendance
+    UNIQUE(user_id, date)
+);
+
+-- 4. Parent/Guardian Contacts Table
+CREATE TABLE IF NOT EXISTS parent_contacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    parent_name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    email TEXT,
+    relationship TEXT DEFAULT 'Parent',
+    is_primary INTEGER DEFAULT 0,
+    is_active INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+    CONSTRAINT check_relationship CHECK (relationship IN ('Parent', 'Guardian', 'Emergency Contact')),
+    CONSTRAINT check_primary CHECK (is_primary IN (0, 1)),
+    CONSTRAINT check_active CHECK (is_active IN (0, 1))
+);
+
+-- 5. Attendance Sessions Table (for tracking attendance periods)
+CREATE TABLE IF NOT EXISTS attendance_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_name TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    zone_id INTEGER NOT NULL,
+    is_active INTEGER DEFAULT 1,
+    created_by TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY(zone_id) REFERENCES location_zones(id),
+    CONSTRAINT check_session_active CHECK (is_active IN (0, 1))
+);
+
+-- 6. Admin Users Table
+CREATE TABLE IF NOT EXISTS admin_users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    email TEXT UNIQUE,
+    full_name TEXT,
+    role TEXT DEFAULT 'admin',
+    is_active INTEGER DEFAULT 1,
+    last_login TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT check_role CHECK (role IN ('admin', 'super_admin', 'teacher')),
+    CONSTRAINT check_admin_active CHECK (is_active IN (0, 1))
+);
+
+-- 7. Attendance Logs Table (for audit trail)
+CREATE TABLE IF NOT EXISTS attendance_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    attendance_id INTEGER,
+    action TEXT NOT NULL,
+    old_values TEXT,
+    new_values TEXT,
+    performed_by TEXT,
+    ip_address TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY(attendance_id) REFERENCES attendance(id) ON DELETE CASCADE,
+    CONSTRAINT check_action CHECK (action IN ('CREATE', 'UPDATE', 'DELETE', 'VERIFY'))
+);
+
+-- 8. Attendance Images Table (photo BLOBs kept out of the hot attendance rows)
+CREATE TABLE IF NOT EXISTS attendance_images (
+    attendance_id INTEGER PRIMARY KEY,
+    image_data BLOB NOT NULL,
+    thumb BLOB,
+
+    FOREIGN KEY(attendance_id) REFERENCES attendance(id) ON DELETE CASCADE
+);
+"""
+
+# Get-or-create a user by name in one statement; the no-op DO UPDATE makes
+# RETURNING yield the existing id on conflict
+SQL_USER_UPSERT = """
+    INSERT INTO users (name) VALUES (?)
+    ON CONFLICT(name) DO UPDATE SET name = excluded.name
+    RETURNING id
+"""
+
+# scrypt cost parameters for admin password hashes
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+
+
+def hash_password(password):
+    """Hash password with salted scrypt, stored as 'salt_hex:key_hex'"""
+    salt = os.urandom(16)
+    dk = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN)
+    return f"{salt.hex()}:{dk.hex()}"
+
+
+def verify_password(password, stored_hash):
+    """Verify password against a scrypt hash (or a legacy unsalted SHA-256 hex digest)"""
+    if ':' not in stored_hash:
+        legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy_hash.encode(), stored_hash.encode())
+
+    salt_hex, dk_hex = stored_hash.split(':', 1)
+    try:
+        salt, expected_dk = bytes.fromhex(salt_hex), bytes.fromhex(dk_hex)
+    except ValueError:
+        return False  # Malformed hash never matches
+    dk = hashlib.scrypt(password.encode(), salt=salt,
+                        n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN)
+    return hmac.compare_digest(dk, expected_dk)
+
+
 class AttendanceDatabase:
     """Database manager for attendance system"""
 
@@ -39,9 +308,17 @@ class AttendanceDatabase:
     def connect(self):
         """Establish database connection"""
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            is_new_db = not os.path.exists(self.db_path) or os.path.getsize(self.db_path) == 0
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            if is_new_db:
+                # Must be set before WAL is enabled and before any table exists
+                self.conn.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+                # Lets deleted photo pages be returned with PRAGMA incremental_vacuum
+                self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
             self.conn.execute("PRAGMA foreign_keys = ON")
             self.conn.execute("PRAGMA journal_mode = WAL")  # Better concurrency
+            self.conn.executescript(SQLITE_TUNING_PRAGMAS)
+            self.conn.executescript(SQLITE_INITIAL_OPTIMIZE)
             logger.info(f"✅ Connected to database: {self.db_path}")
             return self.conn
         except Exception as e:
@@ -56,147 +333,27 @@ class AttendanceDatabase:
         cursor = self.conn.cursor()
 
         try:
-            # 1. Users Table (Enhanced)
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE,
-                phone TEXT,
-                roll_number TEXT UNIQUE,
-                department TEXT,
-                year_of_study INTEGER,
-                is_active INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )""")
-
-            # 2. Location Zones Table
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS location_zones (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                radius_meters REAL NOT NULL,
-                is_active INTEGER DEFAULT 0,
-                created_by TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-                -- Constraints
-                CONSTRAINT check_latitude CHECK (latitude >= -90 AND latitude <= 90),
-                CONSTRAINT check_longitude CHECK (longitude >= -180 AND longitude <= 180),
-                CONSTRAINT check_radius CHECK (radius_meters > 0),
-                CONSTRAINT check_active CHECK (is_active IN (0, 1))
-            )""")
-
-            # 3. Attendance Table (Complete)
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                time TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'Present',
-                image_data BLOB,
-                latitude REAL,
-                longitude REAL,
-                distance_meters REAL,
-                zone_id INTEGER,
-                accuracy_meters REAL,
-                device_info TEXT,
-                ip_address TEXT,
-                user_agent TEXT,
-                notes TEXT,
-                verified_by TEXT,
-                is_manual INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-                -- Foreign Keys
-                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
-                FOREIGN KEY(zone_id) REFERENCES location_zones(id) ON DELETE SET NULL,
-
-                -- Constraints
-                CONSTRAINT check_status CHECK (status IN ('Present', 'Absent', 'Late', 'Excused')),
-                CONSTRAINT check_distance CHECK (distance_meters >= 0),
-                CONSTRAINT check_manual CHECK (is_manual IN (0, 1)),
-
-                -- Unique constraint to prevent duplicate attendance
-                UNIQUE(user_id, date)
-            )""")
-
-            # 4. Parent/Guardian Contacts Table
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS parent_contacts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                parent_name TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                email TEXT,
-                relationship TEXT DEFAULT 'Parent',
-                is_primary INTEGER DEFAULT 0,
-                is_active INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
-                CONSTRAINT check_relationship CHECK (relationship IN ('Parent', 'Guardian', 'Emergency Contact')),
-                CONSTRAINT check_primary CHECK (is_primary IN (0, 1)),
-                CONSTRAINT check_active CHECK (is_active IN (0, 1))
-            )""")
-
-            # 5. Attendance Sessions Table (for tracking attendance periods)
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS attendance_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_name TEXT NOT NULL,
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                start_time TEXT NOT NULL,
-                end_time TEXT NOT NULL,
-                zone_id INTEGER NOT NULL,
-                is_active INTEGER DEFAULT 1,
-                created_by TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-                FOREIGN KEY(zone_id) REFERENCES location_zones(id),
-                CONSTRAINT check_session_active CHECK (is_active IN (0, 1))
-            )""")
-
-            # 6. Admin Users Table
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admin_users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                email TEXT UNIQUE,
-                full_name TEXT,
-                role TEXT DEFAULT 'admin',
-                is_active INTEGER DEFAULT 1,
-                last_login TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-                CONSTRAINT check_role CHECK (role IN ('admin', 'super_admin', 'teacher')),
-                CONSTRAINT check_admin_active CHECK (is_active IN (0, 1))
-            )""")
-
-            # 7. Attendance Logs Table (for audit trail)
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS attendance_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                attendance_id INTEGER,
-                action TEXT NOT NULL,
-                old_values TEXT,
-                new_values TEXT,
-                performed_by TEXT,
-                ip_address TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-                FOREIGN KEY(attendance_id) REFERENCES attendance(id) ON DELETE CASCADE,
-                CONSTRAINT check_action CHECK (action IN ('CREATE', 'UPDATE', 'DELETE', 'VERIFY'))
-            )""")
+            # Create all tables in one explicit transaction together with
+            # indexes, triggers and seed data, so first-time setup commits once
+            cursor.executescript("BEGIN IMMEDIATE;" + SCHEMA_SQL)
+
+            # Bring tables from the original inline schemas up to date
+            self._migrate_legacy_schema(cursor)
+
+            # Move legacy inline photos out of the attendance rows; new
+            # databases have no image_data column on attendance at all
+            cursor.execute("SELECT 1 FROM pragma_table_info('attendance') WHERE name = 'image_data'")
+            if cursor.fetchone():
+                cursor.execute("""
+                    INSERT OR IGNORE INTO attendance_images (attendance_id, image_data)
+                    SELECT id, image_data FROM attendance WHERE image_data IS NOT NULL
+                """)
+                cursor.execute("UPDATE attendance SET image_data = NULL WHERE image_data IS NOT NULL")
+
+            # Small pre-rendered thumbnails for list views (added after attendance_images)
+            cursor.execute("SELECT 1 FROM pragma_table_info('attendance_images') WHERE name = 'thumb'")
+            if not cursor.fetchone():
+                cursor.execute("ALTER TABLE attendance_images ADD COLUMN thumb BLOB")
 
             # Create Indexes for Performance
             self._create_indexes(cursor)
@@ -220,22 +377,92 @@ class AttendanceDatabase:
             logger.error(f"❌ Table creation failed: {e}")
             raise
 
+    def _migrate_legacy_schema(self, cursor):
+        """Add the columns and unique indexes that legacy tables lack"""
+        for table, columns in LEGACY_COLUMNS.items():
+            cursor.execute("SELECT name FROM pragma_table_info(?)", (table,))
+            existing = {row[0] for row in cursor.fetchall()}
+            for column, definition in columns:
+                if column not in existing:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                    logger.info(f"✅ Added column {table}.{column}")
+
+            if table == 'attendance' and 'created_at' not in existing:
+                cursor.execute("UPDATE attendance SET created_at = date || ' ' || time "
+                               "WHERE created_at IS NULL AND date IS NOT NULL AND time IS NOT NULL")
+
+        for index_name, table, columns in LEGACY_UNIQUE_INDEXES:
+            if self._has_unique_index(cursor, table, columns):
+                continue
+
+            if columns == ('name',):
+                # Fold duplicate users into the oldest row before enforcing uniqueness
+                cursor.execute("""
+                    UPDATE attendance SET user_id = (
+                        SELECT MIN(u2.id) FROM users u1 JOIN users u2 ON u2.name = u1.name
+                        WHERE u1.id = attendance.user_id
+                    )
+                    WHERE user_id IN (SELECT id FROM users WHERE id NOT IN (
+                        SELECT MIN(id) FROM users GROUP BY name))
+                """)
+                cursor.execute("DELETE FROM users WHERE id NOT IN (SELECT MIN(id) FROM users GROUP BY name)")
+            elif columns == ('user_id', 'date'):
+                # Keep the first mark of the day
+                cursor.execute("""
+                    DELETE FROM attendance
+                    WHERE user_id IS NOT NULL AND date IS NOT NULL AND id NOT IN (
+                        SELECT MIN(id) FROM attendance GROUP BY user_id, date)
+                """)
+
+            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table}({', '.join(columns)})")
+            logger.info(f"✅ Added unique index {index_name}")
+
+    @staticmethod
+    def _has_unique_index(cursor, table, columns):
+        """Whether a UNIQUE constraint or index covers exactly these columns"""
+        cursor.execute("SELECT name FROM pragma_index_list(?) WHERE \"unique\" = 1", (table,))
+        for (index_name,) in cursor.fetchall():
+            cursor.execute("SELECT name FROM pragma_index_info(?) ORDER BY seqno", (index_name,))
+            if tuple(row[0] for row in cursor.fetchall()) == columns:
+                return True
+        return False
+
     def _create_indexes(self, cursor):
         """Create database indexes for better performance"""
+        # UNIQUE constraints already provide these (users.name/email/roll_number,
+        # attendance(user_id, date) and its user_id prefix, admin_users.username),
+        # and idx_attendance_date / idx_location_zones_active are prefixes of the
+        # ordered (date, time) and (is_active, updated_at) indexes below,
+        # idx_attendance_present_date is covered by idx_att_date_status_user and the
+        # records viewer already walks the rowid b-tree in id order, and
+        # idx_attendance_logs_attendance_id is a prefix of idx_attendance_logs_att;
+        # drop the duplicates from existing databases so writes maintain one b-tree each
+        for redundant_index in ('idx_users_name',
+                                'idx_users_email',
+                                'idx_users_roll_number',
+                                'idx_attendance_user_id',
+                                'idx_attendance_user_date',
+                                'idx_admin_users_username',
+                                'idx_attendance_date',
+                                'idx_location_zones_active',
+                                'idx_attendance_present_date',
+                                'idx_attendance_viewer',
+                                'idx_attendance_logs_attendance_id'):
+            cursor.execute(f"DROP INDEX IF EXISTS {redundant_index}")
+
         indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_users_name ON users(name)",
-            "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)",
-            "CREATE INDEX IF NOT EXISTS idx_users_roll_number ON users(roll_number)",
             "CREATE INDEX IF NOT EXISTS idx_users_active ON users(is_active)",
 
-            "CREATE INDEX IF NOT EXISTS idx_attendance_user_id ON attendance(user_id)",
-            "CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date)",
-            "CREATE INDEX IF NOT EXISTS idx_attendance_user_date ON attendance(user_id, date)",
+            # Dashboard records: WHERE date = ? ORDER BY time DESC, no sort step
+            "CREATE INDEX IF NOT EXISTS idx_attendance_date_time ON attendance(date, time DESC)",
             "CREATE INDEX IF NOT EXISTS idx_attendance_zone_id ON attendance(zone_id)",
             "CREATE INDEX IF NOT EXISTS idx_attendance_status ON attendance(status)",
             "CREATE INDEX IF NOT EXISTS idx_attendance_created_at ON attendance(created_at)",
+            # Covering index for the daily attendance-rate query
+            "CREATE INDEX IF NOT EXISTS idx_att_date_status_user ON attendance(date, status, user_id)",
 
-            "CREATE INDEX IF NOT EXISTS idx_location_zones_active ON location_zones(is_active)",
+            # Active-zone lookup: WHERE is_active = 1 ORDER BY updated_at DESC LIMIT 1
+            "CREATE INDEX IF NOT EXISTS idx_location_zones_active_updated ON location_zones(is_active, updated_at DESC)",
             "CREATE INDEX IF NOT EXISTS idx_location_zones_name ON location_zones(name)",
 
             "CREATE INDEX IF NOT EXISTS idx_parent_contacts_user_id ON parent_contacts(user_id)",
@@ -244,64 +471,45 @@ class AttendanceDatabase:
             "CREATE INDEX IF NOT EXISTS idx_attendance_sessions_active ON attendance_sessions(is_active)",
             "CREATE INDEX IF NOT EXISTS idx_attendance_sessions_dates ON attendance_sessions(start_date, end_date)",
 
-            "CREATE INDEX IF NOT EXISTS idx_admin_users_username ON admin_users(username)",
             "CREATE INDEX IF NOT EXISTS idx_admin_users_active ON admin_users(is_active)",
 
-            "CREATE INDEX IF NOT EXISTS idx_attendance_logs_attendance_id ON attendance_logs(attendance_id)",
-            "CREATE INDEX IF NOT EXISTS idx_attendance_logs_timestamp ON attendance_logs(timestamp)"
+            "CREATE INDEX IF NOT EXISTS idx_attendance_logs_timestamp ON attendance_logs(timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_attendance_logs_att ON attendance_logs(attendance_id, timestamp DESC)"
         ]
 
         for index_sql in indexes:
             cursor.execute(index_sql)
 
+        # Gather planner statistics once so the new indexes get picked up
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if not cursor.fetchone():
+            cursor.execute("ANALYZE")
+
         logger.info("✅ Database indexes created")
 
     def _create_triggers(self, cursor):
-        """Create triggers for automatic timestamping and audit logging"""
+        """Create triggers for audit logging"""
 
-        # Trigger to update 'updated_at' timestamp
-        triggers = [
-            """
-            CREATE TRIGGER IF NOT EXISTS update_users_timestamp 
-            AFTER UPDATE ON users
-            BEGIN
-                UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
-            END
-            """,
-            """
-            CREATE TRIGGER IF NOT EXISTS update_location_zones_timestamp 
-            AFTER UPDATE ON location_zones
-            BEGIN
-                UPDATE location_zones SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
-            END
-            """,
-            """
-            CREATE TRIGGER IF NOT EXISTS update_attendance_timestamp 
-            AFTER UPDATE ON attendance
-            BEGIN
-                UPDATE attendance SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
-            END
-            """,
+        # 'updated_at' is set directly by the application's UPDATE statements and
+        # inserts are not audited (the attendance row already holds those fields);
+        # drop the old triggers from existing databases
+        for legacy_trigger in ('update_users_timestamp',
+                               'update_location_zones_timestamp',
+                               'update_attendance_timestamp',
+                               'audit_attendance_insert'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {legacy_trigger}")
 
-            # Audit trigger for attendance changes
-            """
-            CREATE TRIGGER IF NOT EXISTS audit_attendance_insert 
-            AFTER INSERT ON attendance
-            BEGIN
-                INSERT INTO attendance_logs (attendance_id, action, new_values)
-                VALUES (NEW.id, 'CREATE', json_object(
-                    'user_id', NEW.user_id,
-                    'date', NEW.date,
-                    'time', NEW.time,
-                    'status', NEW.status,
-                    'zone_id', NEW.zone_id,
-                    'distance_meters', NEW.distance_meters
-                ));
-            END
-            """,
+        # Recreate so existing databases pick up the column/WHEN gating
+        cursor.execute("DROP TRIGGER IF EXISTS audit_attendance_update")
+
+        triggers = [
+            # Audit trigger for changes to tracked attendance fields only
             """
             CREATE TRIGGER IF NOT EXISTS audit_attendance_update 
-            AFTER UPDATE ON attendance
+            AFTER UPDATE OF status, notes, verified_by ON attendance
+            WHEN OLD.status IS NOT NEW.status
+              OR OLD.notes IS NOT NEW.notes
+              OR OLD.verified_by IS NOT NEW.verified_by
             BEGIN
                 INSERT INTO attendance_logs (attendance_id, action, old_values, new_values)
                 VALUES (NEW.id, 'UPDATE', 
@@ -329,10 +537,16 @@ class AttendanceDatabase:
         """Insert default data if tables are empty"""
 
         # Check if location zones exist
-        cursor.execute("SELECT COUNT(*) FROM location_zones")
-        zone_count = cursor.fetchone()[0]
+        cursor.execute("SELECT 1 FROM location_zones LIMIT 1")
+        if not cursor.fetchone():
+            # Insert additional sample zones
+            sample_zones = [
+                ('Library', 'College library building', 10.678500, 77.032100, 50),
+                ('Computer Lab', 'Main computer laboratory', 10.678800, 77.032300, 30),
+                ('Auditorium', 'College main auditorium', 10.679000, 77.032500, 100),
+                ('Sports Complex', 'Athletic facilities', 10.679200, 77.032800, 200)
+            ]
 
-        if zone_count == 0:
             # Insert default college location
             cursor.execute("""
                 INSERT INTO location_zones 
@@ -346,31 +560,19 @@ class AttendanceDatabase:
                 DEFAULT_COLLEGE_LOCATION['radius_meters']
             ))
 
-            # Insert additional sample zones
-            sample_zones = [
-                ('Library', 'College library building', 10.678500, 77.032100, 50),
-                ('Computer Lab', 'Main computer laboratory', 10.678800, 77.032300, 30),
-                ('Auditorium', 'College main auditorium', 10.679000, 77.032500, 100),
-                ('Sports Complex', 'Athletic facilities', 10.679200, 77.032800, 200)
-            ]
-
-            for name, desc, lat, lon, radius in sample_zones:
-                cursor.execute("""
-                    INSERT INTO location_zones 
-                    (name, description, latitude, longitude, radius_meters, is_active, created_by)
-                    VALUES (?, ?, ?, ?, ?, 0, 'System')
-                """, (name, desc, lat, lon, radius))
+            cursor.executemany("""
+                INSERT INTO location_zones 
+                (name, description, latitude, longitude, radius_meters, is_active, created_by)
+                VALUES (?, ?, ?, ?, ?, 0, 'System')
+            """, sample_zones)
 
             logger.info(f"✅ Inserted {len(sample_zones) + 1} default location zones")
 
         # Check if admin user exists
-        cursor.execute("SELECT COUNT(*) FROM admin_users")
-        admin_count = cursor.fetchone()[0]
-
-        if admin_count == 0:
+        cursor.execute("SELECT 1 FROM admin_users LIMIT 1")
+        if not cursor.fetchone():
             # Insert default admin (password: admin123)
-            import hashlib
-            default_password_hash = hashlib.sha256("admin123".encode()).hexdigest()
+            default_password_hash = hash_password("admin123")
 
             cursor.execute("""
                 INSERT INTO admin_users 
@@ -395,7 +597,17 @@ class AttendanceDatabase:
         try:
             if self.conn:
                 backup_conn = sqlite3.connect(backup_path)
-                self.conn.backup(backup_conn)
+                # Copy in chunks so other sessions can keep using the database; the
+                # destination must not be in WAL mode yet or it can't take the source page size
+                self.conn.backup(
+                    backup_conn,
+                    pages=BACKUP_PAGES_PER_STEP,
+                    progress=lambda status, remaining, total: logger.info(
+                        f"💾 Backup progress: {total - remaining}/{total} pages"
+                    ),
+                    sleep=0.05
+                )
+                backup_conn.execute("PRAGMA journal_mode = WAL")
                 backup_conn.close()
                 logger.info(f"✅ Database backed up to: {backup_path}")
                 return backup_path
@@ -403,6 +615,24 @@ class AttendanceDatabase:
             logger.error(f"❌ Backup failed: {e}")
             raise
 
+    def migrate_page_size(self):
+        """Rebuild an existing database with PAGE_SIZE pages"""
+        if not self.conn:
+            self.connect()
+
+        current = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        if current == PAGE_SIZE:
+            logger.info(f"✅ Page size already {PAGE_SIZE} bytes")
+            return False
+
+        # page_size cannot change while in WAL mode
+        self.conn.execute("PRAGMA journal_mode = DELETE")
+        self.conn.execute(f"PRAGMA page_size = {PAGE_SIZE}")
+        self.conn.execute("VACUUM")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        logger.info(f"✅ Page size migrated from {current} to {PAGE_SIZE} bytes")
+        return True
+
     def get_database_info(self):
         """Get database statistics and information"""
         if not self.conn:
@@ -411,28 +641,30 @@ class AttendanceDatabase:
         cursor = self.conn.cursor()
         info = {}
 
-        # Get table counts
-        tables = ['users', 'location_zones', 'attendance', 'parent_contacts', 
-                 'attendance_sessions', 'admin_users', 'attendance_logs']
-
-        for table in tables:
-            try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                info[f"{table}_count"] = cursor.fetchone()[0]
-            except:
-                info[f"{table}_count"] = 0
+        # Missing tables are known up-front and reported as 0
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        existing_tables = {row[0] for row in cursor.fetchall()}
+
+        # Get table counts, active zones and latest attendance in one round-trip
+        count_columns = ", ".join(
+            f"(SELECT COUNT(*) FROM {table})" if table in existing_tables else "0"
+            for table in TABLES
+        )
+        cursor.execute(f"""
+            SELECT {count_columns},
+                   (SELECT COUNT(*) FROM location_zones WHERE is_active = 1),
+                   (SELECT MAX(created_at) FROM attendance)
+        """)
+        *counts, active_zones, latest = cursor.fetchone()
+
+        for table, count in zip(TABLES, counts):
+            info[f"{table}_count"] = count
 
         # Database file size
         if os.path.exists(self.db_path):
             info['db_size_mb'] = round(os.path.getsize(self.db_path) / (1024 * 1024), 2)
 
-        # Get active zones
-        cursor.execute("SELECT COUNT(*) FROM location_zones WHERE is_active = 1")
-        info['active_zones'] = cursor.fetchone()[0]
-
-        # Latest attendance
-        cursor.execute("SELECT MAX(created_at) FROM attendance")
-        latest = cursor.fetchone()[0]
+        info['active_zones'] = active_zones
         info['latest_attendance'] = latest if latest else 'None'
 
         return info
@@ -440,15 +672,43 @@ class AttendanceDatabase:
     def close(self):
         """Close database connection"""
         if self.conn:
+            try:
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ PRAGMA optimize failed: {e}")
             self.conn.close()
+            self.conn = None
             logger.info("✅ Database connection closed")
 
 
+# Shared connections, one per database path, so pragmas are applied once per process
+_databases = {}
+
+
+def get_database(db_path="attendance.db"):
+    """Get the shared, connected AttendanceDatabase for db_path"""
+    db = _databases.get(db_path)
+    if db is None or db.conn is None:
+        db = AttendanceDatabase(db_path)
+        db.connect()
+        _databases[db_path] = db
+    return db
+
+
+def close_databases():
+    """Close all shared database connections"""
+    for db in _databases.values():
+        db.close()
+    _databases.clear()
+
+
+atexit.register(close_databases)
+
+
 def create_tables():
     """Main function to create all database tables"""
-    db = AttendanceDatabase()
     try:
-        db.connect()
+        db = get_database()
         db.create_tables()
 
         # Display database info
@@ -462,8 +722,6 @@ def create_tables():
     except Exception as e:
         logger.error(f"❌ Database setup failed: {e}")
         return False
-    finally:
-        db.close()
 
 
 def reset_database():
@@ -471,15 +729,16 @@ def reset_database():
     db_path = "attendance.db"
 
     if os.path.exists(db_path):
-        # Create backup before reset
-        db = AttendanceDatabase(db_path)
+        # Create backup before reset; never delete data that wasn't backed up
         try:
-            db.connect()
-            backup_path = db.backup_database()
+            backup_path = get_database(db_path).backup_database()
             print(f"✅ Backup created: {backup_path}")
-            db.close()
         except Exception as e:
-            print(f"⚠️ Backup failed: {e}")
+            print(f"❌ Backup failed, database left untouched: {e}")
+            return False
+
+        # Release the shared connection before deleting the file
+        close_databases()
 
         # Remove old database
         os.remove(db_path)
@@ -496,6 +755,7 @@ if __name__ == "__main__":
     parser.add_argument('--reset', action='store_true', help='Reset database (WARNING: Deletes all data)')
     parser.add_argument('--backup', action='store_true', help='Create database backup')
     parser.add_argument('--info', action='store_true', help='Show database information')
+    parser.add_argument('--migrate-pagesize', action='store_true', help='Rebuild database with 8 KB pages (runs VACUUM)')
 
     args = parser.parse_args()
 
@@ -510,29 +770,30 @@ if __name__ == "__main__":
             print("❌ Reset cancelled")
 
     elif args.backup:
-        db = AttendanceDatabase()
         try:
-            db.connect()
-            backup_path = db.backup_database()
+            backup_path = get_database().backup_database()
             print(f"✅ Backup created: {backup_path}")
         except Exception as e:
             print(f"❌ Backup failed: {e}")
-        finally:
-            db.close()
+
+    elif args.migrate_pagesize:
+        try:
+            if get_database().migrate_page_size():
+                print("✅ Page size migration completed!")
+            else:
+                print("✅ Page size already up to date")
+        except Exception as e:
+            print(f"❌ Page size migration failed: {e}")
 
     elif args.info:
-        db = AttendanceDatabase()
         try:
-            db.connect()
-            info = db.get_database_info()
+            info = get_database().get_database_info()
             print("\n📊 Database Information:")
             print("=" * 50)
             for key, value in info.items():
                 print(f"{key}: {value}")
         except Exception as e:
             print(f"❌ Info retrieval failed: {e}")
-        finally:
-            db.close()
 
     else:
         if create_tables():
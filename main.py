@@ -2,41 +2,97 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 from datetime import datetime, time
-from io import BytesIO
+from io import BytesIO, StringIO
 from PIL import Image
-import os
+import csv
 import zipfile
+import threading
+
+from db import AttendanceDatabase, OPTIMIZE_INTERVAL_SECONDS, SQL_USER_UPSERT
+
+
+def schedule_optimize(db_conn, lock):
+    """Run PRAGMA optimize on the connection every OPTIMIZE_INTERVAL_SECONDS"""
+    def run_optimize():
+        try:
+            with lock:  # May write sqlite_stat1; keep it out of a session's transaction
+                db_conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            return  # Connection closed, stop rescheduling
+        schedule_optimize(db_conn, lock)
+
+    timer = threading.Timer(OPTIMIZE_INTERVAL_SECONDS, run_optimize)
+    timer.daemon = True
+    timer.start()
+
+
+# Hot-path SQL kept as constants so the statement cache hits on every rerun
+SQL_ATTENDANCE_INSERT = """
+    INSERT INTO attendance (user_id, date, time, status, created_at)
+    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id, date) DO NOTHING
+    RETURNING id
+"""
+SQL_IMAGE_INSERT = "INSERT INTO attendance_images (attendance_id, image_data, thumb) VALUES (?, ?, ?)"
+SQL_THUMB_SELECT = "SELECT COALESCE(thumb, image_data) FROM attendance_images WHERE attendance_id=?"
+SQL_ATTENDANCE_FINGERPRINT = "SELECT COALESCE(MAX(id), 0), COUNT(*) FROM attendance"
+
+RECORDS_PAGE_SIZE = 20
+PHOTO_MAX_SIZE = (640, 480)
+PHOTO_JPEG_QUALITY = 75
+THUMB_SIZE = (80, 80)
+
+
+def compress_photo(img_file):
+    """Downscale a captured photo and re-encode it as JPEG; returns (photo, thumbnail) bytes"""
+    photo = Image.open(img_file)
+    photo.thumbnail(PHOTO_MAX_SIZE, Image.Resampling.LANCZOS)
+    photo = photo.convert("RGB")
+    buffer = BytesIO()
+    photo.save(buffer, format="JPEG", quality=PHOTO_JPEG_QUALITY, optimize=True, progressive=True)
+
+    # Thumbnail from the already-downscaled photo, served as-is by the records viewer
+    photo.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+    thumb_buffer = BytesIO()
+    photo.save(thumb_buffer, format="JPEG", quality=PHOTO_JPEG_QUALITY, optimize=True)
+    return buffer.getvalue(), thumb_buffer.getvalue()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_attendance(_db_conn, fingerprint, page=1):
+    """Load one page of attendance metadata (no image BLOBs); fingerprint changes whenever rows change"""
+    return pd.read_sql_query("""
+        SELECT a.id, u.name, a.date, a.time, a.status
+        FROM attendance a
+        JOIN users u ON a.user_id = u.id
+        ORDER BY a.id DESC
+        LIMIT ? OFFSET ?
+    """, _db_conn, params=(RECORDS_PAGE_SIZE, (page - 1) * RECORDS_PAGE_SIZE))
+
+
+@st.cache_resource
+def get_connection():
+    """One long-lived connection per process; schema, indexes and pragmas come from db.py.
+
+    Every session shares the connection and so its transaction state; the
+    returned lock must be held around each write transaction.
+    """
+    attendance_db = AttendanceDatabase("attendance.db")
+    attendance_db.connect()
+    attendance_db.create_tables()
+    write_lock = threading.Lock()
+    schedule_optimize(attendance_db.conn, write_lock)
+    return attendance_db.conn, write_lock
+
 
 # Title
 st.title("🎓 College Webcam Attendance System")
 
-# Persistent DB connection
-if "conn" not in st.session_state:
-    st.session_state.conn = sqlite3.connect("attendance.db", check_same_thread=False)
-    st.session_state.cursor = st.session_state.conn.cursor()
+conn, write_lock = get_connection()
+if "cursor" not in st.session_state:
+    st.session_state.cursor = conn.cursor()
 
 cursor = st.session_state.cursor
-conn = st.session_state.conn
-
-# Create tables if not exist
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT UNIQUE
-)
-""")
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS attendance (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    date TEXT,
-    time TEXT,
-    status TEXT,
-    image_data BLOB,
-    FOREIGN KEY(user_id) REFERENCES users(id)
-)
-""")
-conn.commit()
 
 # Admin login
 st.sidebar.subheader("🔐 Admin Panel")
@@ -61,39 +117,34 @@ if admin_logged_in:
 
     # Delete attendance records button
     if st.sidebar.button("🗑️ Delete All Attendance Records"):
-        cursor.execute("DELETE FROM attendance")
-        conn.commit()
+        with write_lock:
+            cursor.execute("DELETE FROM attendance")
+            conn.commit()
+            conn.executescript("PRAGMA incremental_vacuum")  # Step to completion; frees photo pages (new databases only)
         st.sidebar.warning("⚠️ All attendance records deleted.")
 
     # Download attendance archive (CSV + images)
-    df = pd.read_sql_query("""
-        SELECT a.id, u.name, a.date, a.time, a.status, a.image_data
-        FROM attendance a
-        JOIN users u ON a.user_id = u.id
-        ORDER BY a.id DESC
-    """, conn)
-
     if st.sidebar.button("📦 Download Attendance Archive"):
-        os.makedirs("attendance_images", exist_ok=True)
-        csv_path = "attendance_images/attendance.csv"
-        df.drop(columns=["image_data"]).to_csv(csv_path, index=False)
-
-        # Save images
-        for i, row in df.iterrows():
-            if row["image_data"]:
-                img_path = f"attendance_images/{row['name']}_{row['time'].replace(':', '-')}.jpg"
-                with open(img_path, "wb") as f:
-                    f.write(row["image_data"])
-
-        # Create ZIP
-        zip_path = "attendance_archive.zip"
-        with zipfile.ZipFile(zip_path, "w") as zipf:
-            zipf.write(csv_path)
-            for file in os.listdir("attendance_images"):
-                zipf.write(os.path.join("attendance_images", file))
-
-        with open(zip_path, "rb") as f:
-            st.sidebar.download_button("📥 Download Archive", f.read(), file_name="attendance_archive.zip", mime="application/zip")
+        archive_buffer = BytesIO()
+        csv_buffer = StringIO()
+        csv_writer = csv.writer(csv_buffer)
+        csv_writer.writerow(["id", "name", "date", "time", "status"])
+
+        # Stream BLOBs straight into the ZIP; JPEGs are already compressed so store them as-is
+        with write_lock, zipfile.ZipFile(archive_buffer, "w", compression=zipfile.ZIP_STORED) as zipf:
+            for att_id, att_name, att_date, att_time, att_status, image_data in cursor.execute("""
+                SELECT a.id, u.name, a.date, a.time, a.status, ai.image_data
+                FROM attendance a
+                JOIN users u ON a.user_id = u.id
+                LEFT JOIN attendance_images ai ON ai.attendance_id = a.id
+                ORDER BY a.id DESC
+            """):
+                csv_writer.writerow([att_id, att_name, att_date, att_time, att_status])
+                if image_data:
+                    zipf.writestr(f"attendance_images/{att_name}_{att_date}_{att_time.replace(':', '-')}.jpg", image_data)
+            zipf.writestr("attendance_images/attendance.csv", csv_buffer.getvalue())
+
+        st.sidebar.download_button("📥 Download Archive", archive_buffer.getvalue(), file_name="attendance_archive.zip", mime="application/zip")
 
 else:
     st.sidebar.info("Admin access required to set attendance time window.")
@@ -116,31 +167,24 @@ if st.button("✅ Mark Attendance", key="mark_btn"):
             end_time = st.session_state.end_time
 
             if start_time <= current_time <= end_time:
-                cursor.execute("SELECT id FROM users WHERE name=?", (name,))
-                result = cursor.fetchone()
-
-                if not result:
-                    cursor.execute("INSERT INTO users (name) VALUES (?)", (name,))
-                    conn.commit()
-                    cursor.execute("SELECT id FROM users WHERE name=?", (name,))
-                    result = cursor.fetchone()
-
-                user_id = result[0]
-                date, time_str = now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S")
-                image_bytes = img.getvalue()
-
-                cursor.execute("""
-                    SELECT * FROM attendance WHERE user_id=? AND date=?
-                """, (user_id, date))
-                if cursor.fetchone():
-                    st.warning(f"⚠️ Attendance already marked today for {name}")
-                else:
-                    cursor.execute("""
-                        INSERT INTO attendance (user_id, date, time, status, image_data)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (user_id, date, time_str, "Present", image_bytes))
-                    conn.commit()
+                date, time_str = now.date().isoformat(), now.time().isoformat(timespec='seconds')
+                image_bytes, thumb_bytes = compress_photo(img)
+
+                # Upsert the user and insert attendance in one transaction;
+                # UNIQUE(user_id, date) with ON CONFLICT DO NOTHING RETURNING id is the duplicate check
+                with write_lock, conn:
+                    cursor.execute(SQL_USER_UPSERT, (name,))
+                    user_id = cursor.fetchone()[0]
+
+                    inserted = cursor.execute(SQL_ATTENDANCE_INSERT, (user_id, date, time_str, "Present")).fetchone()
+                    marked = inserted is not None
+                    if marked:
+                        cursor.execute(SQL_IMAGE_INSERT, (inserted[0], image_bytes, thumb_bytes))
+
+                if marked:
                     st.success(f"✅ Attendance marked for {name} at {time_str}")
+                else:
+                    st.warning(f"⚠️ Attendance already marked today for {name}")
             else:
                 st.warning(f"⏰ Attendance can only be marked between {start_time.strftime('%H:%M')} and {end_time.strftime('%H:%M')}")
     else:
@@ -148,14 +192,18 @@ if st.button("✅ Mark Attendance", key="mark_btn"):
 
 # Attendance viewer
 if st.checkbox("📊 Show Attendance Records"):
-    df = pd.read_sql_query("""
-        SELECT a.id, u.name, a.date, a.time, a.status, a.image_data
-        FROM attendance a
-        JOIN users u ON a.user_id = u.id
-        ORDER BY a.id DESC
-    """, conn)
+    # Reads on the shared connection take the write lock too, or they could see (and cache)
+    # another session's uncommitted mark
+    with write_lock:
+        fingerprint = cursor.execute(SQL_ATTENDANCE_FINGERPRINT).fetchone()
+    total_pages = max(1, -(-fingerprint[1] // RECORDS_PAGE_SIZE))
 
     st.markdown("### 📋 Attendance Records")
+    # Stable key keeps the page across reruns; clamp it when records are deleted
+    st.session_state.records_page = min(st.session_state.get("records_page", 1), total_pages)
+    page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key="records_page")
+    with write_lock:
+        df = load_attendance(conn, fingerprint, page)
 
     # Table headers
     col1, col2, col3, col4, col5 = st.columns([1.5, 2, 2, 2, 2])
@@ -166,13 +214,16 @@ if st.checkbox("📊 Show Attendance Records"):
     col5.markdown("**✅ Status**")
 
     # Table rows
-    for _, row in df.iterrows():
+    for att_id, att_name, att_date, att_time, att_status in df.itertuples(index=False, name=None):
         col1, col2, col3, col4, col5 = st.columns([1.5, 2, 2, 2, 2])
-        if row['image_data']:
-            col1.image(BytesIO(row['image_data']), width=80)
+        # Fetch the photo only for rows actually rendered
+        with write_lock:
+            image_row = cursor.execute(SQL_THUMB_SELECT, (att_id,)).fetchone()
+        if image_row:
+            col1.image(image_row[0], width=80)
         else:
             col1.write("No image")
-        col2.write(row['name'])
-        col3.write(row['date'])
-        col4.write(row['time'])
-        col5.write(row['status'])
+        col2.write(att_name)
+        col3.write(att_date)
+        col4.write(att_time)
+        col5.write(att_status)
@@ -17,30 +17,42 @@ Features:
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
 import sqlite3
 import pandas as pd
-from datetime import datetime, time, timedelta
+from datetime import datetime, time, timedelta, timezone
 from io import BytesIO
 from PIL import Image
 import os
 import hashlib
+import hmac
 import secrets
 import json
 import time as time_module
 import logging
+import threading
+from math import asin, cos, hypot, radians, sin, sqrt
 from typing import Dict, Optional, Tuple, Any
 
+from db import SQLITE_TUNING_PRAGMAS, SQL_USER_UPSERT
+from validation import sanitize_name
+
 # Third-party imports
 try:
     from streamlit_js_eval import streamlit_js_eval
-    from geopy.distance import geodesic
     import folium
-    from streamlit_folium import folium_static
 except ImportError as e:
     st.error(f"❌ Missing required package: {e}")
     st.info("Run: pip install -r requirements.txt")
     st.stop()
 
+# Optional imports (ellipsoidal refinement near large-zone boundaries)
+try:
+    from geopy.distance import geodesic
+    GEOPY_AVAILABLE = True
+except ImportError:
+    GEOPY_AVAILABLE = False
+
 # Optional imports (SMS functionality)
 try:
     from twilio.rest import Client
@@ -86,9 +98,24 @@ class Config:
     DEFAULT_COLLEGE_LOCATION = (10.678922, 77.032420)
     DEFAULT_ALLOWED_RADIUS_KM = 5.5
     MAX_IMAGE_SIZE_MB = 5
+    PHOTO_MAX_SIZE = (640, 480)
+    PHOTO_JPEG_QUALITY = 75
+    THUMB_SIZE = (80, 80)
+    PHOTO_DISPLAY_SIZE = (320, 320)  # Gallery columns are narrower than this
+    RECORDS_PAGE_SIZE = 50
+    PHOTOS_PAGE_SIZE = 9
+    PHOTO_CACHE_ENTRIES = 256
     ATTENDANCE_COOLDOWN_MINUTES = 60
     LOCATION_EXPIRE_MINUTES = 5
 
+    # Distance calculation: flat-earth approximation up to this radius, haversine beyond
+    GEODESIC_RADIUS_THRESHOLD_M = 20000
+    METERS_PER_DEG_LAT = 110540.0
+    METERS_PER_DEG_LON_EQUATOR = 111320.0
+    EARTH_RADIUS_M = 6371008.8
+    SPHERICAL_ERROR_MARGIN = 0.005  # Sphere vs. ellipsoid, relative
+    PREFILTER_MARGIN = 0.1  # Flat estimate vs. great circle on huge zones, relative
+
     # Database
     DB_PATH = "attendance.db"
 
@@ -111,32 +138,115 @@ class Security:
 
     @staticmethod
     def verify_admin_password(password: str) -> bool:
-        """Verify admin password"""
-        stored_hash = os.environ.get("ADMIN_PASSWORD_HASH")
-        if not stored_hash:
-            stored_hash = Security.hash_password(Config.ADMIN_PASSWORD_DEFAULT)
-        return Security.hash_password(password) == stored_hash
+        """Verify admin password (constant-time compare of raw digests)"""
+        expected = get_admin_password_digest()
+        if expected is None:
+            return False
+        candidate = hashlib.sha256(password.encode()).digest()
+        return hmac.compare_digest(candidate, expected)
 
-    @staticmethod
-    def sanitize_name(name: str) -> Optional[str]:
-        """Sanitize and validate student name"""
-        if not name:
-            return None
+    # Imported so its cache outlives the rerun that redefines this class
+    sanitize_name = staticmethod(sanitize_name)
 
-        # Clean and normalize
-        name = ' '.join(name.strip().split())
+@st.cache_resource
+def get_admin_password_digest() -> Optional[bytes]:
+    """Expected admin digest, computed once per process (None if ADMIN_PASSWORD_HASH is malformed)"""
+    try:
+        return bytes.fromhex(
+            os.environ.get("ADMIN_PASSWORD_HASH") or Security.hash_password(Config.ADMIN_PASSWORD_DEFAULT)
+        )
+    except ValueError:
+        logger.error("ADMIN_PASSWORD_HASH is not a valid hex digest; admin login disabled")
+        return None
 
-        if len(name) < 2 or len(name) > 100:
-            logger.warning(f"Invalid name length: {len(name)}")
-            return None
+# --- Database Management ---
+# Hot-path SQL kept as constants so the statement cache hits on every rerun
+SQL_ACTIVE_ZONE = """
+    SELECT id, name, description, latitude, longitude, radius_meters, is_active 
+    FROM location_zones 
+    WHERE is_active = 1 
+    ORDER BY updated_at DESC 
+    LIMIT 1
+"""
 
-        if not all(c.isalpha() or c.isspace() or c in "'-." for c in name):
-            logger.warning(f"Invalid characters in name: {name}")
-            return None
+SQL_ATTENDANCE_STATS = """
+    SELECT
+        (SELECT COUNT(*) FROM users WHERE is_active = 1),
+        (SELECT COUNT(*) FROM attendance WHERE date = ? AND status = 'Present')
+"""
 
-        return name.lower()  # Store in lowercase for consistency
+SQL_ATTENDANCE_INSERT = """
+    INSERT INTO attendance 
+    (user_id, date, time, status, latitude, longitude, 
+     distance_meters, zone_id, accuracy_meters, device_info, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, date) DO NOTHING
+    RETURNING id
+"""
+
+SQL_IMAGE_INSERT = "INSERT INTO attendance_images (attendance_id, image_data, thumb) VALUES (?, ?, ?)"
+
+SQL_IMAGE_SELECT = "SELECT image_data FROM attendance_images WHERE attendance_id = ?"
+
+SQL_ATTENDANCE_TIME = """
+    SELECT a.time FROM attendance a
+    JOIN users u ON u.id = a.user_id
+    WHERE u.name = ? AND a.date = ?
+"""
+
+SQL_ALL_ZONES = """
+    SELECT id, name, description, latitude, longitude,
+           radius_meters, is_active, created_at
+    FROM location_zones
+    ORDER BY is_active DESC, created_at DESC
+"""
+
+SQL_DAY_RECORDS = """
+    SELECT 
+        u.name as "Student Name",
+        a.time as "Time",
+        a.status as "Status",
+        lz.name as "Location Zone",
+        ROUND(a.distance_meters, 1) || 'm' as "Distance",
+        CASE WHEN ai.attendance_id IS NOT NULL THEN '✅' ELSE '❌' END as "Photo",
+        ROUND(a.accuracy_meters, 0) || 'm' as "GPS Accuracy"
+    FROM attendance a 
+    JOIN users u ON a.user_id = u.id
+    LEFT JOIN location_zones lz ON a.zone_id = lz.id
+    LEFT JOIN attendance_images ai ON ai.attendance_id = a.id
+    WHERE a.date = ? 
+    ORDER BY a.time DESC
+"""
+
+# Photo metadata only; the join just checks the photo row exists
+SQL_PHOTO_RECORDS = """
+    SELECT a.id, u.name, a.time
+    FROM attendance a
+    JOIN users u ON a.user_id = u.id
+    JOIN attendance_images ai ON ai.attendance_id = a.id
+    WHERE a.date = ?
+    ORDER BY a.time
+"""
+
+SQL_MARKED_NAMES = """
+    SELECT u.name FROM attendance a
+    JOIN users u ON u.id = a.user_id
+    WHERE a.date = ?
+"""
+
+SQL_ABSENT_STUDENTS = """
+    SELECT u.name FROM users u
+    WHERE u.is_active = 1 AND NOT EXISTS (
+        SELECT 1 FROM attendance a
+        WHERE a.user_id = u.id AND a.date = ? AND a.status = 'Present'
+    )
+    ORDER BY u.name
+"""
+
+def sql_timestamp() -> str:
+    """Current UTC time in SQLite's CURRENT_TIMESTAMP format, for binding as a parameter"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
 
-# --- Database Management ---
 class DatabaseManager:
     """Enhanced database operations"""
 
@@ -148,9 +258,10 @@ class DatabaseManager:
     def get_connection(_self):
         """Get cached database connection"""
         try:
-            conn = sqlite3.connect(_self.db_path, check_same_thread=False)
+            conn = sqlite3.connect(_self.db_path, check_same_thread=False, cached_statements=256)
             conn.execute("PRAGMA foreign_keys = ON")
             conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SQLITE_TUNING_PRAGMAS)
             logger.info("✅ Database connected successfully")
             return conn
         except Exception as e:
@@ -158,19 +269,52 @@ class DatabaseManager:
             st.error(f"❌ Database connection failed: {e}")
             return None
 
-    def ensure_tables_exist(self):
-        """Ensure all required tables exist"""
+    @st.cache_resource
+    def get_write_lock(_self) -> threading.Lock:
+        """Lock held around every write transaction on the shared connection"""
+        return threading.Lock()
+
+    @st.cache_resource
+    def get_read_connection(_self):
+        """Get a cached read-only connection for dashboard reads (falls back to the writer)"""
+        writer = _self.get_connection()
+        if not writer:
+            return None
+        try:
+            # Opened after the writer so the file exists and is already in WAL mode;
+            # a separate connection lets these reads run alongside a marking transaction
+            conn = sqlite3.connect(f"file:{_self.db_path}?mode=ro", uri=True,
+                                   check_same_thread=False, cached_statements=256)
+            conn.executescript(SQLITE_TUNING_PRAGMAS)
+            return conn
+        except Exception as e:
+            logger.error(f"Read-only connection error: {e}")
+            return writer
+
+    def get_cursor(self) -> Optional[sqlite3.Cursor]:
+        """Get a cursor reused for the whole session"""
         conn = self.get_connection()
         if not conn:
-            return False
+            return None
+
+        if '_db_cursor' not in st.session_state:
+            st.session_state._db_cursor = conn.cursor()
+        return st.session_state._db_cursor
+
+    def ensure_tables_exist(self):
+        """Ensure all required tables exist (checked once per session)"""
+        if st.session_state.get('_tables_verified'):
+            return True
 
-        cursor = conn.cursor()
+        cursor = self.get_cursor()
+        if not cursor:
+            return False
 
         # Check if required tables exist
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
         existing_tables = [row[0] for row in cursor.fetchall()]
 
-        required_tables = ['users', 'location_zones', 'attendance']
+        required_tables = ['users', 'location_zones', 'attendance', 'attendance_images']
         missing_tables = [t for t in required_tables if t not in existing_tables]
 
         if missing_tables:
@@ -179,24 +323,27 @@ class DatabaseManager:
             st.info("Please run: python db.py")
             return False
 
+        st.session_state._tables_verified = True
         return True
 
     def get_active_location_zone(self) -> Optional[Dict]:
-        """Get the currently active location zone"""
-        conn = self.get_connection()
+        """Get the currently active location zone (cached until a zone changes)"""
+        return self._load_active_zone(self.db_path)
+
+    def invalidate_active_zone(self):
+        """Drop the cached active zone for every session after a zone change"""
+        DatabaseManager._load_active_zone.clear()
+
+    @st.cache_data(ttl=30, show_spinner=False)
+    def _load_active_zone(_self, db_path: str) -> Optional[Dict]:
+        """Query the active location zone"""
+        # Read connection: the writer would expose another session's uncommitted zone change
+        conn = _self.get_read_connection()
         if not conn:
             return None
 
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, name, description, latitude, longitude, radius_meters, is_active 
-                FROM location_zones 
-                WHERE is_active = 1 
-                ORDER BY updated_at DESC 
-                LIMIT 1
-            """)
-            result = cursor.fetchone()
+            result = conn.execute(SQL_ACTIVE_ZONE).fetchone()
 
             if result:
                 zone = {
@@ -208,6 +355,9 @@ class DatabaseManager:
                     'radius_meters': result[5],
                     'is_active': result[6]
                 }
+                # Precompute equirectangular scale factors for is_within_zone
+                zone['_mlat'] = Config.METERS_PER_DEG_LAT
+                zone['_mlon'] = Config.METERS_PER_DEG_LON_EQUATOR * cos(radians(zone['latitude']))
                 logger.debug(f"Active zone found: {zone['name']}")
                 return zone
             else:
@@ -217,22 +367,17 @@ class DatabaseManager:
             logger.error(f"Error getting active zone: {e}")
             return None
 
-    def get_all_zones(self) -> pd.DataFrame:
-        """Get all location zones"""
-        conn = self.get_connection()
+    def get_all_zones(self) -> list:
+        """Get all location zones as raw row tuples"""
+        conn = self.get_read_connection()
         if not conn:
-            return pd.DataFrame()
+            return []
 
         try:
-            return pd.read_sql_query("""
-                SELECT id, name, description, latitude, longitude, 
-                       radius_meters, is_active, created_at
-                FROM location_zones
-                ORDER BY is_active DESC, created_at DESC
-            """, conn)
+            return conn.execute(SQL_ALL_ZONES).fetchall()
         except Exception as e:
             logger.error(f"Error getting zones: {e}")
-            return pd.DataFrame()
+            return []
 
     def create_zone(self, name: str, description: str, lat: float, lon: float, 
                    radius: float, set_active: bool = False) -> bool:
@@ -242,18 +387,19 @@ class DatabaseManager:
             return False
 
         try:
-            cursor = conn.cursor()
-
-            if set_active:
-                cursor.execute("UPDATE location_zones SET is_active = 0")
-
-            cursor.execute("""
-                INSERT INTO location_zones 
-                (name, description, latitude, longitude, radius_meters, is_active, created_by, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, 'admin', datetime('now'))
-            """, (name, description, lat, lon, radius, 1 if set_active else 0))
-
-            conn.commit()
+            updated_at = sql_timestamp()
+            # One transaction (one commit, rolled back on error) for deactivate + insert
+            with self.get_write_lock(), conn:
+                if set_active:
+                    conn.execute("UPDATE location_zones SET is_active = 0, updated_at = ? WHERE is_active = 1", (updated_at,))
+
+                conn.execute("""
+                    INSERT INTO location_zones 
+                    (name, description, latitude, longitude, radius_meters, is_active, created_by, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, 'admin', ?)
+                """, (name, description, lat, lon, radius, 1 if set_active else 0, updated_at))
+
+            self.invalidate_active_zone()
             logger.info(f"Zone created: {name}")
             return True
         except Exception as e:
@@ -267,13 +413,14 @@ class DatabaseManager:
             return False
 
         try:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE location_zones SET is_active = 0")
-            cursor.execute(
-                "UPDATE location_zones SET is_active = 1, updated_at = datetime('now') WHERE id = ?",
-                (zone_id,)
-            )
-            conn.commit()
+            # Deactivate the current zone and activate the new one in a single statement
+            with self.get_write_lock(), conn:
+                conn.execute(
+                    "UPDATE location_zones SET is_active = (id = ?), updated_at = ? "
+                    "WHERE is_active = 1 OR id = ?",
+                    (zone_id, sql_timestamp(), zone_id)
+                )
+            self.invalidate_active_zone()
             logger.info(f"Zone {zone_id} activated")
             return True
         except Exception as e:
@@ -281,75 +428,138 @@ class DatabaseManager:
             return False
 
     def get_attendance_stats(self, date_str: str = None) -> Dict:
-        """Get attendance statistics"""
+        """Get attendance statistics (cached until attendance changes)"""
         if date_str is None:
-            date_str = datetime.now().strftime("%Y-%m-%d")
-
-        conn = self.get_connection()
-        if not conn:
-            return {'total': 0, 'present': 0, 'absent': 0, 'rate': 0}
+            date_str = datetime.now().date().isoformat()
 
         try:
-            cursor = conn.cursor()
-
-            # Get total registered users
-            cursor.execute("SELECT COUNT(*) FROM users WHERE is_active = 1")
-            total_users = cursor.fetchone()[0]
-
-            # Get present count for the date
-            cursor.execute("""
-                SELECT COUNT(DISTINCT user_id) 
-                FROM attendance 
-                WHERE date = ? AND status = 'Present'
-            """, (date_str,))
-            present = cursor.fetchone()[0]
-
-            absent = total_users - present
-            attendance_rate = (present / total_users * 100) if total_users > 0 else 0
-
-            return {
-                'total': total_users, 
-                'present': present, 
-                'absent': absent, 
-                'rate': attendance_rate
-            }
+            return self._load_attendance_stats(self.db_path, date_str)
         except Exception as e:
             logger.error(f"Stats calculation error: {e}")
             return {'total': 0, 'present': 0, 'absent': 0, 'rate': 0}
 
-    def mark_attendance(self, user_id: int, image_data: bytes, location: Dict, 
-                       zone: Dict, distance: float) -> bool:
-        """Mark attendance in database"""
-        conn = self.get_connection()
+    def invalidate_attendance_caches(self):
+        """Drop cached statistics and day records for every session after attendance changes"""
+        DatabaseManager._load_attendance_stats.clear()
+        DatabaseManager._load_day_records.clear()
+        DatabaseManager._encode_day_records_csv.clear()
+
+    @st.cache_data(ttl=10, show_spinner=False)
+    def _load_attendance_stats(_self, db_path: str, date_str: str) -> Dict:
+        """Query attendance statistics for a date"""
+        # Read connection, so an in-flight mark that may still roll back is never cached
+        conn = _self.get_read_connection()
         if not conn:
-            return False
+            raise sqlite3.OperationalError("No database connection")
+
+        # Total registered users and present count for the date in one round-trip
+        total_users, present = conn.execute(SQL_ATTENDANCE_STATS, (date_str,)).fetchone()
+
+        absent = total_users - present
+        attendance_rate = (present / total_users * 100) if total_users > 0 else 0
+
+        return {
+            'total': total_users, 
+            'present': present, 
+            'absent': absent, 
+            'rate': attendance_rate
+        }
+
+    def get_day_records(self, date_str: str) -> pd.DataFrame:
+        """Get the dashboard records for a date (cached until attendance changes)"""
+        return self._load_day_records(self.db_path, date_str)
+
+    @st.cache_data(ttl=60, show_spinner=False)
+    def _load_day_records(_self, db_path: str, date_str: str) -> pd.DataFrame:
+        """Query the dashboard records for a date (photo presence only, no BLOBs)"""
+        return pd.read_sql_query(SQL_DAY_RECORDS, _self.get_read_connection(), params=(date_str,))
+
+    def get_day_records_csv(self, date_str: str) -> bytes:
+        """Get the day's records as CSV bytes (encoded once until attendance changes)"""
+        return self._encode_day_records_csv(self.db_path, date_str)
+
+    @st.cache_data(ttl=60, show_spinner=False)
+    def _encode_day_records_csv(_self, db_path: str, date_str: str) -> bytes:
+        """Encode the day's records as CSV straight into a bytes buffer"""
+        csv_buffer = BytesIO()
+        _self.get_day_records(date_str).to_csv(csv_buffer, index=False, encoding='utf-8')
+        return csv_buffer.getvalue()
+
+    @st.cache_resource(max_entries=2, show_spinner=False)
+    def _marked_names(_self, db_path: str, date_str: str) -> set:
+        """Names marked on a date, loaded once per day and kept current by mark_attendance"""
+        return {name for (name,) in _self.get_read_connection().execute(SQL_MARKED_NAMES, (date_str,))}
+
+    def get_marked_time(self, user_name: str, date_str: str) -> Optional[str]:
+        """Time the user was marked on the date; the in-memory set skips the query for unmarked users"""
+        marked = self._marked_names(self.db_path, date_str)
+        if user_name not in marked:
+            return None
+        row = self.get_read_connection().execute(SQL_ATTENDANCE_TIME, (user_name, date_str)).fetchone()
+        if row is None:
+            marked.discard(user_name)  # Record deleted since the set was loaded
+            return None
+        return row[0]
+
+    def get_absent_students(self, date_str: str) -> list:
+        """Get names of active students with no Present record for the date"""
+        conn = self.get_read_connection()
+        if not conn:
+            return []
 
         try:
-            cursor = conn.cursor()
-            now = datetime.now()
-            date_str = now.strftime("%Y-%m-%d")
-            time_str = now.strftime("%H:%M:%S")
-
-            cursor.execute("""
-                INSERT INTO attendance 
-                (user_id, date, time, status, image_data, latitude, longitude, 
-                 distance_meters, zone_id, accuracy_meters, device_info, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
-            """, (
-                user_id, date_str, time_str, "Present", image_data,
-                location['latitude'], location['longitude'],
-                distance, zone['id'], 
-                location.get('accuracy', 0),
-                f"Browser: {st.context.headers.get('user-agent', 'Unknown')}"
-            ))
-
-            conn.commit()
-            logger.info(f"Attendance marked: user_id={user_id} at {time_str}")
-            return True
+            return [name for (name,) in conn.execute(SQL_ABSENT_STUDENTS, (date_str,))]
         except Exception as e:
-            logger.error(f"Error marking attendance: {e}")
+            logger.error(f"Absentee query error: {e}")
+            return []
+
+    def mark_attendance(self, user_name: str, image_data: bytes, thumb_data: bytes,
+                       location: Dict, zone: Dict, distance: float,
+                       now: Optional[datetime] = None) -> Optional[bool]:
+        """Get-or-create the user and mark attendance in one transaction (None if already marked today)"""
+        conn = self.get_connection()
+        if not conn:
             return False
 
+        now = now or datetime.now()
+        # isoformat is a fixed-format C path, unlike locale-aware strftime
+        date_str = now.date().isoformat()
+        time_str = now.time().isoformat(timespec='seconds')
+        device_info = f"Browser: {st.context.headers.get('user-agent', 'Unknown')}"
+
+        # The connection (and its open transaction) is shared by every session
+        with self.get_write_lock():
+            try:
+                cursor = conn.cursor()
+                # UNIQUE(name) resolves the user, UNIQUE(user_id, date) is the duplicate check
+                user_id = cursor.execute(SQL_USER_UPSERT, (user_name,)).fetchone()[0]
+                inserted = cursor.execute(SQL_ATTENDANCE_INSERT, (
+                    user_id, date_str, time_str, "Present",
+                    location['latitude'], location['longitude'],
+                    distance, zone['id'], 
+                    location.get('accuracy', 0),
+                    device_info,
+                    sql_timestamp()  # Migrated databases have no column default
+                )).fetchone()
+                if inserted is None:
+                    conn.rollback()  # Nothing written; release the write lock
+                    self._marked_names(self.db_path, date_str).add(user_name)
+                    logger.info(f"Attendance already marked: user_id={user_id} on {date_str}")
+                    return None
+
+                cursor.execute(SQL_IMAGE_INSERT, (inserted[0], image_data, thumb_data))
+
+                conn.commit()  # Single commit for user, attendance and photo
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error marking attendance: {e}")
+                return False
+
+        self._marked_names(self.db_path, date_str).add(user_name)
+        self.invalidate_attendance_caches()
+        logger.info(f"Attendance marked: user_id={user_id} at {time_str}")
+        return True
+
 # --- Location Utilities ---
 class LocationManager:
     """Location and GPS utilities"""
@@ -378,16 +588,28 @@ class LocationManager:
             zone_lon = float(zone['longitude'])
             zone_radius = float(zone['radius_meters'])
 
-            logger.debug(f"Student: ({student_lat:.6f}, {student_lon:.6f})")
-            logger.debug(f"Zone: ({zone_lat:.6f}, {zone_lon:.6f}), radius: {zone_radius}m")
-
-            # Calculate distance using geopy
-            student_coords = (student_lat, student_lon)
-            zone_coords = (zone_lat, zone_lon)
-
-            distance_meters = geodesic(zone_coords, student_coords).meters
-
-            logger.info(f"Distance from {zone['name']}: {distance_meters:.2f}m (max: {zone_radius}m)")
+            # Lazy %-style args: formatted only if a handler accepts the record
+            logger.debug("Student: (%.6f, %.6f)", student_lat, student_lon)
+            logger.debug("Zone: (%.6f, %.6f), radius: %sm", zone_lat, zone_lon, zone_radius)
+
+            # Equirectangular approximation, accurate to meters at campus scale
+            mlat = zone.get('_mlat', Config.METERS_PER_DEG_LAT)
+            mlon = zone.get('_mlon') or Config.METERS_PER_DEG_LON_EQUATOR * cos(radians(zone_lat))
+            dx = ((student_lon - zone_lon + 180) % 360 - 180) * mlon
+            dy = (student_lat - zone_lat) * mlat
+            distance_meters = hypot(dx, dy)
+
+            # Huge zones: the flat estimate settles clear hits and misses; only the band
+            # around the radius pays for haversine, and a full geodesic when it lands
+            # within the sphere's error band
+            if (zone_radius > Config.GEODESIC_RADIUS_THRESHOLD_M and
+                    abs(distance_meters - zone_radius) <= zone_radius * Config.PREFILTER_MARGIN):
+                distance_meters = LocationManager.haversine_m(zone_lat, zone_lon, student_lat, student_lon)
+                near_boundary = abs(distance_meters - zone_radius) <= zone_radius * Config.SPHERICAL_ERROR_MARGIN
+                if near_boundary and GEOPY_AVAILABLE:
+                    distance_meters = geodesic((zone_lat, zone_lon), (student_lat, student_lon)).meters
+
+            logger.info("Distance from %s: %.2fm (max: %sm)", zone['name'], distance_meters, zone_radius)
 
             is_within = distance_meters <= zone_radius
 
@@ -397,6 +619,26 @@ class LocationManager:
             logger.error(f"Location validation error: {e}")
             return False, None
 
+    @staticmethod
+    def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """Great-circle distance in meters between two points in degrees"""
+        phi1, phi2 = radians(lat1), radians(lat2)
+        a = sin((phi2 - phi1) / 2) ** 2 + cos(phi1) * cos(phi2) * sin(radians(lon2 - lon1) / 2) ** 2
+        return 2 * Config.EARTH_RADIUS_M * asin(min(1.0, sqrt(a)))
+
+    @staticmethod
+    def check_session_location(zone: Dict) -> Tuple[bool, Optional[float]]:
+        """is_within_zone for the session location, computed once per location fix and zone"""
+        location = st.session_state.get('location')
+        key = (location.get('timestamp'), zone['id'], zone['latitude'], zone['longitude'], zone['radius_meters'])
+        cached = st.session_state.get('_zone_check')
+        if cached and cached[0] == key:
+            return cached[1]
+
+        result = LocationManager.is_within_zone(location, zone)
+        st.session_state._zone_check = (key, result)
+        return result
+
     @staticmethod
     def get_location_js() -> str:
         """Generate JavaScript code for location capture"""
@@ -464,16 +706,22 @@ class ImageValidator:
             return False, "No image provided"
 
         try:
-            # Check file size
-            img_size_mb = len(img_buffer.getvalue()) / (1024 * 1024)
+            # Check file size without copying the buffer
+            img_buffer.seek(0, 2)
+            img_size_mb = img_buffer.tell() / (1024 * 1024)
+            img_buffer.seek(0)
             if img_size_mb > Config.MAX_IMAGE_SIZE_MB:
                 return False, f"Image too large ({img_size_mb:.1f}MB). Max: {Config.MAX_IMAGE_SIZE_MB}MB"
 
-            # Validate image format
-            img = Image.open(BytesIO(img_buffer.getvalue()))
+            # Validate image format from the header only (no pixel decode)
+            try:
+                with Image.open(img_buffer) as img:
+                    img.verify()
+                    width, height = img.size
+            finally:
+                img_buffer.seek(0)
 
             # Check image dimensions
-            width, height = img.size
             if width < 100 or height < 100:
                 return False, "Image too small. Minimum 100x100 pixels."
 
@@ -487,6 +735,26 @@ class ImageValidator:
             logger.error(f"Image validation error: {e}")
             return False, f"Invalid image format: {str(e)}"
 
+    @staticmethod
+    def compress_image(img_buffer) -> Tuple[bytes, bytes]:
+        """Downscale a captured photo and re-encode it as JPEG; returns (photo, thumbnail) bytes"""
+        img_buffer.seek(0)
+        with Image.open(img_buffer) as img:
+            img.draft('RGB', Config.PHOTO_MAX_SIZE)  # Let the JPEG decoder downscale while decoding
+            img.thumbnail(Config.PHOTO_MAX_SIZE, Image.Resampling.LANCZOS)
+            photo = img.convert('RGB')
+        img_buffer.seek(0)
+
+        buffer = BytesIO()
+        photo.save(buffer, format='JPEG', quality=Config.PHOTO_JPEG_QUALITY,
+                   optimize=True, progressive=True)
+
+        # Thumbnail from the already-decoded photo, served as raw bytes by list views
+        photo.thumbnail(Config.THUMB_SIZE, Image.Resampling.LANCZOS)
+        thumb_buffer = BytesIO()
+        photo.save(thumb_buffer, format='JPEG', quality=Config.PHOTO_JPEG_QUALITY, optimize=True)
+        return buffer.getvalue(), thumb_buffer.getvalue()
+
 # --- SMS Notifications (Optional) ---
 class NotificationManager:
     """SMS and email notifications"""
@@ -533,16 +801,22 @@ class NotificationManager:
             logger.error(f"SMS failed to {to_number}: {e}")
             return False
 
+@st.cache_resource
+def get_notification_manager() -> NotificationManager:
+    """One notification manager (and Twilio client) per process, not per rerun"""
+    return NotificationManager()
+
 # --- Initialize Global Objects ---
 db_manager = DatabaseManager()
 location_manager = LocationManager()
 image_validator = ImageValidator()
-notification_manager = NotificationManager()
+notification_manager = get_notification_manager()
 
 # --- Streamlit App Components ---
 
+@st.fragment(run_every=30)
 def render_header():
-    """Render application header"""
+    """Render application header (status strip refreshes itself every 30s)"""
     st.title("🎓 College Webcam Attendance System")
     st.markdown("### 📍 GPS-Verified Attendance with Real-time Photo Capture")
 
@@ -695,10 +969,32 @@ def render_admin_sidebar():
 
     return True
 
+@st.cache_data(max_entries=64, persist="disk", show_spinner=False)
+def zone_map_html(lat: float, lon: float, radius: float, color: str,
+                  zoom_start: int, popup: Optional[str] = None) -> str:
+    """Build a Folium zone map once per distinct zone and return its HTML (kept across restarts)"""
+    zone_map = folium.Map(location=[lat, lon], zoom_start=zoom_start)
+    if popup is not None:
+        folium.Marker([lat, lon], popup=popup).add_to(zone_map)
+    folium.Circle(
+        location=[lat, lon],
+        radius=radius,
+        color=color,
+        fill=True,
+        fillColor=color,
+        fillOpacity=0.3
+    ).add_to(zone_map)
+    return zone_map.get_root().render()
+
+@st.fragment
 def render_zone_manager():
     """Render location zone management interface"""
     st.header("🗺️ Location Zone Manager")
 
+    # Message from the action that triggered the last full rerun
+    if 'zone_flash' in st.session_state:
+        st.success(st.session_state.pop('zone_flash'))
+
     tab1, tab2 = st.tabs(["📍 Create Zone", "📋 Manage Zones"])
 
     with tab1:
@@ -707,30 +1003,36 @@ def render_zone_manager():
         col1, col2 = st.columns([2, 1])
 
         with col1:
-            zone_name = st.text_input("Zone Name", placeholder="e.g., Computer Lab A")
-            zone_desc = st.text_area("Description", placeholder="Optional description")
-
-            col1a, col1b = st.columns(2)
-            with col1a:
-                latitude = st.number_input(
-                    "Latitude", 
-                    value=Config.DEFAULT_COLLEGE_LOCATION[0],
-                    format="%.6f"
-                )
-            with col1b:
-                longitude = st.number_input(
-                    "Longitude", 
-                    value=Config.DEFAULT_COLLEGE_LOCATION[1],
-                    format="%.6f"
+            # Inputs live in a form so typing doesn't rerun (and re-render the map) per keystroke
+            with st.form("new_zone"):
+                zone_name = st.text_input("Zone Name", placeholder="e.g., Computer Lab A")
+                zone_desc = st.text_area("Description", placeholder="Optional description")
+
+                col1a, col1b = st.columns(2)
+                with col1a:
+                    latitude = st.number_input(
+                        "Latitude", 
+                        value=Config.DEFAULT_COLLEGE_LOCATION[0],
+                        format="%.6f"
+                    )
+                with col1b:
+                    longitude = st.number_input(
+                        "Longitude", 
+                        value=Config.DEFAULT_COLLEGE_LOCATION[1],
+                        format="%.6f"
+                    )
+
+                radius = st.slider(
+                    "Radius (meters)", 
+                    min_value=10, max_value=10000, 
+                    value=100, step=10
                 )
 
-            radius = st.slider(
-                "Radius (meters)", 
-                min_value=10, max_value=10000, 
-                value=100, step=10
-            )
+                set_active = st.checkbox("Set as active zone", value=True)
 
-            set_active = st.checkbox("Set as active zone", value=True)
+                col1c, col1d = st.columns(2)
+                preview_clicked = col1c.form_submit_button("🗺️ Preview")
+                create_clicked = col1d.form_submit_button("💾 Create Zone", type="primary")
 
         with col2:
             st.info("**Radius Guidelines:**\n\n🏫 Campus: 5000-10000m\n🚪 Classroom: 10-50m\n📚 Library: 30-100m\n🔬 Lab: 20-50m")
@@ -750,21 +1052,12 @@ def render_zone_manager():
                     longitude = st.session_state.temp_lon
                     st.rerun()
 
-        # Map preview
-        if latitude and longitude:
-            preview_map = folium.Map(location=[latitude, longitude], zoom_start=16)
-            folium.Marker([latitude, longitude], popup=zone_name or "New Zone").add_to(preview_map)
-            folium.Circle(
-                location=[latitude, longitude],
-                radius=radius,
-                color='blue',
-                fill=True,
-                fillColor='blue',
-                fillOpacity=0.3
-            ).add_to(preview_map)
-            folium_static(preview_map, width=700, height=300)
-
-        if st.button("💾 Create Zone", type="primary"):
+        # Map preview, only built when the form is submitted
+        if (preview_clicked or create_clicked) and latitude and longitude:
+            preview_html = zone_map_html(latitude, longitude, radius, 'blue', 16, zone_name or "New Zone")
+            components.html(preview_html, width=700, height=300)
+
+        if create_clicked:
             if not zone_name:
                 st.error("❌ Zone name is required")
             else:
@@ -772,8 +1065,8 @@ def render_zone_manager():
                     zone_name, zone_desc or "", latitude, longitude, radius, set_active
                 )
                 if success:
-                    st.success(f"✅ Zone '{zone_name}' created successfully!")
-                    time_module.sleep(1)
+                    # Full rerun: the sidebar and header show the active zone outside this fragment
+                    st.session_state.zone_flash = f"✅ Zone '{zone_name}' created successfully!"
                     st.rerun()
                 else:
                     st.error("❌ Failed to create zone")
@@ -781,43 +1074,36 @@ def render_zone_manager():
     with tab2:
         st.subheader("Manage Existing Zones")
 
-        zones_df = db_manager.get_all_zones()
+        zones = db_manager.get_all_zones()
 
-        if zones_df.empty:
+        if not zones:
             st.info("No zones created yet")
         else:
-            for _, zone in zones_df.iterrows():
+            for zid, name, desc, lat, lon, rad, active, created in zones:
                 with st.expander(
-                    f"{'🟢' if zone['is_active'] else '⚪'} {zone['name']} - {zone['radius_meters']:.0f}m",
-                    expanded=zone['is_active'] == 1
+                    f"{'🟢' if active else '⚪'} {name} - {rad:.0f}m",
+                    expanded=active == 1
                 ):
                     col1, col2, col3 = st.columns([2, 2, 1])
 
                     with col1:
-                        st.write(f"**Description:** {zone['description'] or 'N/A'}")
-                        st.write(f"**Coordinates:** {zone['latitude']:.6f}, {zone['longitude']:.6f}")
-                        st.write(f"**Radius:** {zone['radius_meters']:.0f} meters")
+                        st.write(f"**Description:** {desc or 'N/A'}")
+                        st.write(f"**Coordinates:** {lat:.6f}, {lon:.6f}")
+                        st.write(f"**Radius:** {rad:.0f} meters")
 
                     with col2:
-                        st.write(f"**Status:** {'✅ Active' if zone['is_active'] else '⚪ Inactive'}")
-                        st.write(f"**Created:** {zone['created_at'][:16]}")
+                        st.write(f"**Status:** {'✅ Active' if active else '⚪ Inactive'}")
+                        st.write(f"**Created:** {created[:16]}")
 
                         # Mini map
-                        mini_map = folium.Map(location=[zone['latitude'], zone['longitude']], zoom_start=15)
-                        folium.Circle(
-                            location=[zone['latitude'], zone['longitude']],
-                            radius=zone['radius_meters'],
-                            color='red' if zone['is_active'] else 'gray',
-                            fill=True,
-                            fillOpacity=0.3
-                        ).add_to(mini_map)
-                        folium_static(mini_map, width=250, height=150)
+                        mini_html = zone_map_html(lat, lon, rad, 'red' if active else 'gray', 15)
+                        components.html(mini_html, width=250, height=150)
 
                     with col3:
-                        if zone['is_active'] == 0:
-                            if st.button("Activate", key=f"activate_{zone['id']}"):
-                                if db_manager.activate_zone(zone['id']):
-                                    st.success("✅ Zone activated")
+                        if active == 0:
+                            if st.button("Activate", key=f"activate_{zid}"):
+                                if db_manager.activate_zone(zid):
+                                    st.session_state.zone_flash = "✅ Zone activated"
                                     st.rerun()
 
     if st.button("✖️ Close Zone Manager"):
@@ -825,6 +1111,7 @@ def render_zone_manager():
             del st.session_state.show_zone_manager
         st.rerun()
 
+@st.fragment
 def render_student_attendance():
     """Render student attendance marking section"""
     st.header("👤 Student Attendance")
@@ -848,7 +1135,7 @@ def render_student_attendance():
 
     with location_status_col:
         if 'location' in st.session_state and st.session_state.location:
-            is_valid, distance = location_manager.is_within_zone(st.session_state.location, active_zone)
+            is_valid, distance = location_manager.check_session_location(active_zone)
 
             if is_valid:
                 st.success(f"✅ Location Verified! Distance: {distance:.1f}m from {active_zone['name']}")
@@ -863,48 +1150,42 @@ def render_student_attendance():
                 del st.session_state.location
                 st.rerun()
 
-    # Get location button
+    # Get location button; each click starts a new request with its own component key
     if st.button("🌍 Get My Location", type="primary", use_container_width=True):
-        with st.spinner("🛰️ Getting your GPS location... Please allow location access."):
-            js_code = location_manager.get_location_js()
-
-            location_data = streamlit_js_eval(
-                js_expressions=js_code,
-                want_output=True,
-                key=f"student_location_{secrets.token_hex(4)}"
-            )
-
-            # Wait for result
-            time_module.sleep(1)
-
-            if isinstance(location_data, dict) and 'latitude' in location_data:
-                st.session_state.location = location_data
-                st.session_state.location_timestamp = datetime.now()
-
-                st.success("📍 Location captured successfully!")
-                st.info(f"**Coordinates:** {location_data['latitude']:.6f}, {location_data['longitude']:.6f}")
-                st.info(f"**Accuracy:** ±{location_data.get('accuracy', 0):.0f} meters")
-
-                # Validate immediately
-                is_valid, distance = location_manager.is_within_zone(location_data, active_zone)
-
-                if is_valid:
-                    st.success(f"✅ You are within the attendance zone! ({distance:.1f}m from center)")
-                else:
-                    st.error(f"❌ You are outside the attendance zone! ({distance:.1f}m from center)")
+        st.session_state.location_request = st.session_state.get('location_request', 0) + 1
+        st.session_state.locating = True
+
+    if st.session_state.get('locating'):
+        # Same key on every run of this request, so the browser's answer is read back on the rerun
+        location_data = streamlit_js_eval(
+            js_expressions=location_manager.get_location_js(),
+            want_output=True,
+            key=f"student_location_{st.session_state.location_request}"
+        )
 
+        if isinstance(location_data, dict) and 'latitude' in location_data:
+            st.session_state.location = location_data
+            st.session_state.location_timestamp = time_module.monotonic()  # Freshness clock, not wall time
+            del st.session_state.locating
+            st.rerun()
+        elif location_data is None:
+            # None until the browser answers; the component reruns the script with the result
+            st.info("🛰️ Getting your GPS location... Please allow location access.")
+            if st.button("✖️ Cancel"):
+                del st.session_state.locating
                 st.rerun()
-            else:
-                st.error("❌ Could not get your location. Please ensure:")
-                st.markdown("""
-                - Location services are enabled on your device
-                - You granted permission to this website  
-                - You're using a modern browser (Chrome, Firefox, Safari)
-                - You're not in incognito/private browsing mode
-                """)
+        else:
+            del st.session_state.locating
+            st.error("❌ Could not get your location. Please ensure:")
+            st.markdown("""
+            - Location services are enabled on your device
+            - You granted permission to this website  
+            - You're using a modern browser (Chrome, Firefox, Safari)
+            - You're not in incognito/private browsing mode
+            """)
 
-                if location_data and isinstance(location_data, str):
-                    st.error(f"Error: {location_data}")
+            if isinstance(location_data, str):
+                st.error(f"Error: {location_data}")
 
     # Step 2: Mark Attendance
     st.markdown("---")
@@ -913,12 +1194,12 @@ def render_student_attendance():
     # Check if location is valid
     location_valid = False
     if 'location' in st.session_state and st.session_state.location:
-        is_valid, distance = location_manager.is_within_zone(st.session_state.location, active_zone)
+        is_valid, distance = location_manager.check_session_location(active_zone)
         location_valid = is_valid
 
         # Check location freshness
         if 'location_timestamp' in st.session_state:
-            elapsed_minutes = (datetime.now() - st.session_state.location_timestamp).seconds / 60
+            elapsed_minutes = (time_module.monotonic() - st.session_state.location_timestamp) / 60
             if elapsed_minutes > Config.LOCATION_EXPIRE_MINUTES:
                 st.warning(f"⚠️ Location verification expired ({elapsed_minutes:.0f} min ago). Please refresh.")
                 location_valid = False
@@ -947,8 +1228,8 @@ def render_student_attendance():
 
         # Show small preview
         with st.expander("👀 Photo Preview"):
-            img = Image.open(img_buffer)
-            st.image(img, width=200, caption="Your attendance photo")
+            # st.image reads the upload directly; no PIL decode or copy needed
+            st.image(img_buffer, width=200, caption="Your attendance photo")
 
     # Mark attendance button
     attendance_button_disabled = not (location_valid and name.strip() and img_buffer)
@@ -964,16 +1245,17 @@ def render_student_attendance():
 def process_attendance_marking(name: str, img_buffer, active_zone: Dict):
     """Process the attendance marking"""
     try:
-        # Validate inputs
-        sanitized_name = Security.sanitize_name(name)
-        if not sanitized_name:
-            st.error("❌ Invalid name format. Please use only letters, spaces, and basic punctuation.")
-            return
+        # One timestamp for the window check, the stored record and the message
+        now = datetime.now()
 
-        # Validate image
-        is_valid_img, img_msg = image_validator.validate_image(img_buffer)
-        if not is_valid_img:
-            st.error(f"❌ Image validation failed: {img_msg}")
+        # Check time window (cheapest checks first; image parsing and DB work come last)
+        current_time = now.time()
+        start_time = st.session_state.get('start_time', Config.DEFAULT_START_TIME)
+        end_time = st.session_state.get('end_time', Config.DEFAULT_END_TIME)
+
+        if not (start_time <= current_time <= end_time):
+            st.error(f"❌ Attendance can only be marked between {start_time.strftime('%H:%M')} "
+                    f"and {end_time.strftime('%H:%M')}")
             return
 
         # Check location validity
@@ -983,72 +1265,59 @@ def process_attendance_marking(name: str, img_buffer, active_zone: Dict):
 
         # Validate location freshness
         if 'location_timestamp' in st.session_state:
-            elapsed_minutes = (datetime.now() - st.session_state.location_timestamp).seconds / 60
+            elapsed_minutes = (time_module.monotonic() - st.session_state.location_timestamp) / 60
             if elapsed_minutes > Config.LOCATION_EXPIRE_MINUTES:
                 st.error("❌ Location verification expired. Please refresh your location.")
                 return
 
         # Check zone proximity
-        is_within, distance = location_manager.is_within_zone(st.session_state.location, active_zone)
+        is_within, distance = location_manager.check_session_location(active_zone)
         if not is_within:
             st.error(f"❌ Cannot mark attendance. You are {distance:.1f}m from {active_zone['name']} "
                     f"(maximum allowed: {active_zone['radius_meters']:.0f}m)")
             return
 
-        # Check time window
-        current_time = datetime.now().time()
-        start_time = st.session_state.get('start_time', Config.DEFAULT_START_TIME)
-        end_time = st.session_state.get('end_time', Config.DEFAULT_END_TIME)
+        # Validate inputs
+        sanitized_name = Security.sanitize_name(name)
+        if not sanitized_name:
+            st.error("❌ Invalid name format. Please use only letters, spaces, and basic punctuation.")
+            return
 
-        if not (start_time <= current_time <= end_time):
-            st.error(f"❌ Attendance can only be marked between {start_time.strftime('%H:%M')} "
-                    f"and {end_time.strftime('%H:%M')}")
+        # Validate image
+        is_valid_img, img_msg = image_validator.validate_image(img_buffer)
+        if not is_valid_img:
+            st.error(f"❌ Image validation failed: {img_msg}")
             return
 
-        # Get or create user
-        conn = db_manager.get_connection()
-        if not conn:
+        # Mark attendance (creates the user on first mark)
+        cursor = db_manager.get_cursor()
+        if not cursor:
             st.error("❌ Database connection failed")
             return
 
-        cursor = conn.cursor()
-
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE name=?", (sanitized_name,))
-        result = cursor.fetchone()
-
-        if not result:
-            # Create new user
-            cursor.execute("INSERT INTO users (name) VALUES (?)", (sanitized_name,))
-            conn.commit()
-            user_id = cursor.lastrowid
-            logger.info(f"New user created: {sanitized_name} (ID: {user_id})")
-        else:
-            user_id = result[0]
-
-        # Check for duplicate attendance
-        today = datetime.now().strftime("%Y-%m-%d")
-        cursor.execute("SELECT id, time FROM attendance WHERE user_id=? AND date=?", (user_id, today))
-        existing = cursor.fetchone()
-
-        if existing:
-            st.warning(f"⚠️ Attendance already marked for '{sanitized_name.title()}' today at {existing[1]}")
+        today = now.date().isoformat()
+        display_name = sanitized_name.title()
+        marked_time = db_manager.get_marked_time(sanitized_name, today)
+        if marked_time:
+            st.warning(f"⚠️ Attendance already marked for '{display_name}' today at {marked_time}")
             return
 
-        # Mark attendance
-        image_bytes = img_buffer.getvalue()
+        image_bytes, thumb_bytes = image_validator.compress_image(img_buffer)
         success = db_manager.mark_attendance(
-            user_id, image_bytes, st.session_state.location, active_zone, distance
+            sanitized_name, image_bytes, thumb_bytes, st.session_state.location, active_zone, distance, now
         )
 
-        if success:
-            current_time_str = datetime.now().strftime("%H:%M:%S")
+        if success is None:
+            existing = cursor.execute(SQL_ATTENDANCE_TIME, (sanitized_name, today)).fetchone()
+            st.warning(f"⚠️ Attendance already marked for '{display_name}' today at {existing[0]}")
+        elif success:
+            current_time_str = now.time().isoformat(timespec='seconds')
 
             # Success message
             st.success(f"""
             🎉 **Attendance Marked Successfully!**
 
-            **Student:** {sanitized_name.title()}  
+            **Student:** {display_name}  
             **Time:** {current_time_str}  
             **Date:** {today}  
             **Location:** {active_zone['name']}  
@@ -1061,12 +1330,8 @@ def process_attendance_marking(name: str, img_buffer, active_zone: Dict):
             if 'location_timestamp' in st.session_state:
                 del st.session_state.location_timestamp
 
-            # Celebration effect
+            # Celebration effect; the success panel stays up until the next interaction
             st.balloons()
-
-            # Auto-refresh after delay
-            time_module.sleep(2)
-            st.rerun()
         else:
             st.error("❌ Failed to mark attendance. Please try again.")
 
@@ -1096,7 +1361,7 @@ def render_dashboard():
             index=0
         )
 
-    date_str = selected_date.strftime("%Y-%m-%d")
+    date_str = selected_date.isoformat()
 
     # Statistics cards
     stats = db_manager.get_attendance_stats(date_str)
@@ -1112,34 +1377,32 @@ def render_dashboard():
         st.progress(stats['rate'] / 100)
         st.caption(f"Attendance Rate: {stats['rate']:.1f}%")
 
+    if stats['absent'] > 0:
+        with st.expander(f"🚫 Absent Students ({stats['absent']})"):
+            st.write(", ".join(db_manager.get_absent_students(date_str)))
+
     # Attendance records
     st.markdown("---")
     st.subheader(f"📝 Attendance Records - {selected_date.strftime('%B %d, %Y')}")
 
-    conn = db_manager.get_connection()
-    if conn:
+    if db_manager.get_connection():
         try:
-            df = pd.read_sql_query("""
-                SELECT 
-                    u.name as "Student Name",
-                    a.time as "Time",
-                    a.status as "Status",
-                    lz.name as "Location Zone",
-                    ROUND(a.distance_meters, 1) || 'm' as "Distance",
-                    CASE WHEN a.image_data IS NOT NULL THEN '✅' ELSE '❌' END as "Photo",
-                    ROUND(a.accuracy_meters, 0) || 'm' as "GPS Accuracy"
-                FROM attendance a 
-                JOIN users u ON a.user_id = u.id
-                LEFT JOIN location_zones lz ON a.zone_id = lz.id
-                WHERE a.date = ? 
-                ORDER BY a.time DESC
-            """, conn, params=(date_str,))
+            df = db_manager.get_day_records(date_str)
 
             if df.empty:
                 st.info(f"📭 No attendance records found for {selected_date.strftime('%B %d, %Y')}")
             else:
+                # Send one page of rows to the browser per rerun; the CSV below still has the full day
+                total_pages = max(1, -(-len(df) // Config.RECORDS_PAGE_SIZE))
+                page = 1
+                if total_pages > 1:
+                    # Stable key keeps the page across reruns; clamp it when the day has fewer rows
+                    st.session_state.records_page = min(st.session_state.get('records_page', 1), total_pages)
+                    page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key='records_page')
+                start = (page - 1) * Config.RECORDS_PAGE_SIZE
+
                 st.dataframe(
-                    df, 
+                    df.iloc[start:start + Config.RECORDS_PAGE_SIZE], 
                     use_container_width=True, 
                     hide_index=True,
                     column_config={
@@ -1156,7 +1419,7 @@ def render_dashboard():
                 # Export options
                 col1, col2 = st.columns(2)
                 with col1:
-                    csv_data = df.to_csv(index=False)
+                    csv_data = db_manager.get_day_records_csv(date_str)
                     st.download_button(
                         "📥 Download CSV",
                         data=csv_data,
@@ -1166,8 +1429,10 @@ def render_dashboard():
 
                 with col2:
                     # Show photos option
-                    if st.button("📷 View Photos"):
-                        show_attendance_photos(date_str)
+                    show_photos = st.toggle("📷 View Photos")
+
+                if show_photos:
+                    show_attendance_photos(date_str)
 
         except Exception as e:
             st.error(f"❌ Error loading records: {e}")
@@ -1178,23 +1443,23 @@ def render_dashboard():
             del st.session_state.show_dashboard
         st.rerun()
 
+@st.cache_resource(max_entries=Config.PHOTO_CACHE_ENTRIES, show_spinner=False)
+def load_attendance_photo(attendance_id: int) -> Image.Image:
+    """Fetch and decode an attendance photo once at gallery size; photos never change after insert"""
+    image_data = db_manager.get_read_connection().execute(SQL_IMAGE_SELECT, (attendance_id,)).fetchone()[0]
+    img = Image.open(BytesIO(image_data))
+    img.draft('RGB', Config.PHOTO_DISPLAY_SIZE)  # Let the JPEG decoder scale down by a power of two
+    img.thumbnail(Config.PHOTO_DISPLAY_SIZE, Image.Resampling.LANCZOS)
+    return img
+
 def show_attendance_photos(date_str: str):
-    """Display attendance photos for a specific date"""
-    conn = db_manager.get_connection()
+    """Display attendance photos for a specific date, loading BLOBs only for the visible page"""
+    conn = db_manager.get_read_connection()
     if not conn:
         return
 
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.name, a.time, a.image_data
-            FROM attendance a
-            JOIN users u ON a.user_id = u.id
-            WHERE a.date = ? AND a.image_data IS NOT NULL
-            ORDER BY a.time
-        """, (date_str,))
-
-        records = cursor.fetchall()
+        records = conn.execute(SQL_PHOTO_RECORDS, (date_str,)).fetchall()
 
         if not records:
             st.info("No photos found for this date")
@@ -1202,12 +1467,17 @@ def show_attendance_photos(date_str: str):
 
         st.subheader(f"📷 Attendance Photos - {date_str}")
 
+        total_pages = max(1, -(-len(records) // Config.PHOTOS_PAGE_SIZE))
+        st.session_state.photos_page = min(st.session_state.get('photos_page', 1), total_pages)
+        page = st.number_input("Photo page", min_value=1, max_value=total_pages, step=1, key='photos_page')
+        start = (page - 1) * Config.PHOTOS_PAGE_SIZE
+
         cols = st.columns(3)
-        for i, (name, time, image_data) in enumerate(records):
+        for i, (attendance_id, name, time) in enumerate(records[start:start + Config.PHOTOS_PAGE_SIZE]):
             col = cols[i % 3]
             with col:
                 try:
-                    img = Image.open(BytesIO(image_data))
+                    img = load_attendance_photo(attendance_id)
                     st.image(img, caption=f"{name.title()}\n{time}", use_column_width=True)
                 except Exception as e:
                     st.error(f"Error loading image for {name}")
@@ -1220,10 +1490,9 @@ def main():
     """Main application function"""
     try:
         # Initialize session state
-        if 'show_zone_manager' not in st.session_state:
-            st.session_state.show_zone_manager = False
-        if 'show_dashboard' not in st.session_state:
-            st.session_state.show_dashboard = False
+        ss = st.session_state
+        ss.setdefault('show_zone_manager', False)
+        ss.setdefault('show_dashboard', False)
 
         # Render header
         render_header()
@@ -1236,10 +1505,10 @@ def main():
         # Render admin sidebar
         is_admin = render_admin_sidebar()
 
-        # Main content based on admin selections
-        if st.session_state.get('show_zone_manager', False) and is_admin:
+        # Main content based on admin selections (read after the sidebar may have toggled them)
+        if ss.get('show_zone_manager', False) and is_admin:
             render_zone_manager()
-        elif st.session_state.get('show_dashboard', False):
+        elif ss.get('show_dashboard', False):
             render_dashboard()
         else:
             # Default: Student attendance section
@@ -0,0 +1,142 @@
+"""Schema setup and migration tests for db.py"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from db import AttendanceDatabase, SQL_USER_UPSERT, hash_password, verify_password  # noqa: E402
+
+# Schema written by the original main.py before db.py owned the tables
+BASELINE_MAIN_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    date TEXT,
+    time TEXT,
+    status TEXT,
+    image_data BLOB,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+"""
+
+
+class SchemaTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "attendance.db")
+        self.db = None
+
+    def tearDown(self):
+        if self.db:
+            self.db.close()
+        shutil.rmtree(self.tmpdir)
+
+    def open_db(self):
+        self.db = AttendanceDatabase(self.db_path)
+        self.db.connect()
+        self.db.create_tables()
+        return self.db.conn
+
+    def columns(self, conn, table):
+        return {row[0] for row in conn.execute("SELECT name FROM pragma_table_info(?)", (table,))}
+
+    def assert_app_writes_work(self, conn):
+        user_id = conn.execute(SQL_USER_UPSERT, ("new student",)).fetchone()[0]
+        self.assertEqual(conn.execute(SQL_USER_UPSERT, ("new student",)).fetchone()[0], user_id)
+
+        insert = ("INSERT INTO attendance (user_id, date, time, status) VALUES (?, ?, ?, 'Present') "
+                  "ON CONFLICT(user_id, date) DO NOTHING RETURNING id")
+        self.assertIsNotNone(conn.execute(insert, (user_id, "2025-10-01", "09:00:00")).fetchone())
+        self.assertIsNone(conn.execute(insert, (user_id, "2025-10-01", "09:05:00")).fetchone())
+        conn.commit()
+
+
+class TestLegacyMigration(SchemaTestCase):
+    def test_shipped_database(self):
+        shutil.copy(os.path.join(REPO_ROOT, "attendance.db"), self.db_path)
+        conn = self.open_db()
+
+        self.assertIn("is_active", self.columns(conn, "users"))
+        self.assertIn("description", self.columns(conn, "location_zones"))
+        self.assertTrue({"zone_id", "distance_meters", "created_at"} <= self.columns(conn, "attendance"))
+
+        # Inline photos moved out of the attendance rows
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM attendance WHERE image_data IS NOT NULL").fetchone()[0], 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM attendance_images").fetchone()[0],
+                         conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0])
+
+        self.assert_app_writes_work(conn)
+
+    def test_baseline_main_database(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(BASELINE_MAIN_SCHEMA)
+        conn.execute("INSERT INTO users (name) VALUES ('alice')")
+        conn.executemany("INSERT INTO attendance (user_id, date, time, status, image_data) VALUES (?, ?, ?, ?, ?)", [
+            (1, "2025-09-01", "09:00:00", "Present", b"first"),
+            (1, "2025-09-01", "09:10:00", "Present", b"second"),
+        ])
+        conn.commit()
+        conn.close()
+
+        conn = self.open_db()
+
+        # Duplicate marks collapse to the first one before uniqueness is enforced
+        self.assertEqual(conn.execute("SELECT time FROM attendance").fetchall(), [("09:00:00",)])
+        self.assert_app_writes_work(conn)
+
+    def test_create_tables_is_idempotent(self):
+        self.open_db()
+        self.db.create_tables()
+        indexes = {row[0] for row in self.db.conn.execute("SELECT name FROM pragma_index_list('users')")}
+        # New databases rely on the table's own UNIQUE constraint
+        self.assertNotIn("idx_users_name_unique", indexes)
+        self.assert_app_writes_work(self.db.conn)
+
+
+class TestBackup(SchemaTestCase):
+    def test_backup_of_wal_database(self):
+        conn = self.open_db()
+        self.assert_app_writes_work(conn)
+
+        backup_path = self.db.backup_database(os.path.join(self.tmpdir, "backup.db"))
+
+        backup = sqlite3.connect(backup_path)
+        try:
+            self.assertEqual(backup.execute("PRAGMA page_size").fetchone(),
+                             conn.execute("PRAGMA page_size").fetchone())
+            self.assertEqual(backup.execute("SELECT COUNT(*) FROM attendance").fetchone()[0], 1)
+        finally:
+            backup.close()
+
+
+class TestPasswordHashing(unittest.TestCase):
+    def test_scrypt_round_trip(self):
+        stored = hash_password("s3cret")
+        self.assertTrue(verify_password("s3cret", stored))
+        self.assertFalse(verify_password("wrong", stored))
+        # Fresh salt per hash
+        self.assertNotEqual(stored, hash_password("s3cret"))
+
+    def test_legacy_sha256_digest(self):
+        stored = hashlib.sha256(b"admin123").hexdigest()
+        self.assertTrue(verify_password("admin123", stored))
+        self.assertFalse(verify_password("admin124", stored))
+
+    def test_malformed_hash(self):
+        for stored in ("zz:00", "00:not-hex", ":", "abc:", "ünïcode"):
+            self.assertFalse(verify_password("admin123", stored), stored)
+
+
+if __name__ == "__main__":
+    unittest.main()
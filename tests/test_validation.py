@@ -0,0 +1,30 @@
+"""Name validation tests for validation.py"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validation import sanitize_name  # noqa: E402
+
+
+class TestSanitizeName(unittest.TestCase):
+    def test_normalizes_valid_names(self):
+        self.assertEqual(sanitize_name("  Mary-Jane   O'Neil "), "mary-jane o'neil")
+        self.assertEqual(sanitize_name("José Müller"), "josé müller")
+        self.assertEqual(sanitize_name("Νίκος Παπάς"), "νίκος παπάς")
+
+    def test_rejects_numeric_characters(self):
+        for name in ("a²", "bob½", "Henry Ⅷ", "agent 007"):
+            with self.subTest(name=name):
+                self.assertIsNone(sanitize_name(name))
+
+    def test_rejects_bad_length_and_symbols(self):
+        for name in ("", "a", "x" * 101, "bob_smith", "bob@home"):
+            with self.subTest(name=name):
+                self.assertIsNone(sanitize_name(name))
+
+
+if __name__ == "__main__":
+    unittest.main()
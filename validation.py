@@ -0,0 +1,37 @@
+"""
+Input validation shared by the attendance apps.
+
+Lives outside the Streamlit scripts so module-level state (translation tables,
+caches) survives reruns instead of being rebuilt every time the script runs.
+"""
+
+import functools
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Punctuation allowed in names; stripped (with spaces) before the str.isalpha check
+NAME_PUNCTUATION = str.maketrans('', '', " '-.")
+
+
+@functools.lru_cache(maxsize=1024)
+def sanitize_name(name: str) -> Optional[str]:
+    """Sanitize and validate student name"""
+    if not name:
+        return None
+
+    # Clean and normalize
+    name = ' '.join(name.strip().split())
+
+    if len(name) < 2 or len(name) > 100:
+        logger.warning(f"Invalid name length: {len(name)}")
+        return None
+
+    # Letters (str.isalpha, any script), whitespace and ' - . only
+    letters = name.translate(NAME_PUNCTUATION)
+    if letters and not letters.isalpha():
+        logger.warning(f"Invalid characters in name: {name}")
+        return None
+
+    return name.lower()  # Store in lowercase for consistency